@@ -63,6 +63,9 @@ def init_logging(level):
 # Initialize parser
 parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter)
 
+parser.add_argument("command", type=str, nargs="?", choices=("run", "plan"), default="run",
+                    help="run the computation, or only print expected rows, database size and stage times\n\n")
+
 parser.add_argument("-n", type=int, nargs="+",
                     help="number of nodes n in graph  (sequence separated by whitespace)\n\n", required=True)
 parser.add_argument("-k", type=int, nargs="+", default=(2,),
@@ -95,8 +98,9 @@ parser.add_argument("--generator", type=str, default=var.DEFAULT_GENERATOR,
 
 for calc_type in (CANON, CERTIFICATE, SUBT_EXTR, GAP):
     CALC_ROWS = '\n'.join(f"{i:>4}. {c.CALC_NAME}" for i, c in enumerate(CALCULATIONS[calc_type]))
-    parser.add_argument(f"--{calc_type}", type=int, default=0,
-                        help=f"selected calculation for {calc_type.upper()}, among the following (default: 0)\n" + CALC_ROWS + "\n\n")
+    CALC_DEFAULT = f"0, MinCut from n={var.SUBT_MINCUT_MIN_N}" if calc_type == SUBT_EXTR else "0"
+    parser.add_argument(f"--{calc_type}", type=int, default=None,
+                        help=f"selected calculation for {calc_type.upper()}, among the following (default: {CALC_DEFAULT})\n" + CALC_ROWS + "\n\n")
 
 parser.add_argument("--delete", action="store_true",
                     help="delete and re-initialize databases\n\n")
@@ -196,6 +200,11 @@ if __name__ == '__main__':
         if args.weights is not None:
             assert sum(args.weights) == k
         for n in args.n:
+            if args.command == "plan":
+                ctsp.plan(k=k, n=n, weights=args.weights,
+                          strategy=args.strategy.upper(), generator=args.generator.lower(),
+                          reduced=args.reduced, **options)
+                continue
             ctsp.run(
                 k=k, n=n, weights=args.weights,
                 strategy=args.strategy.upper(), generator=args.generator.lower(), calcs_indices=calcs_indices,
@@ -17,12 +17,20 @@ def _get_name(gap_ind, subt_extr_ind, canon_ind, cert_ind):
     # return f"{canon_ind*8 + subt_extr_ind:x}"
 
 
+def _get_default_index(calc_type, n=None):
+    if calc_type == SUBT_EXTR and n is not None and n >= var.SUBT_MINCUT_MIN_N:
+        return subt_extr.CALCULATIONS_LIST.index(subt_extr.SUBTEXTR_MinCut_Chain)
+    return 0
+
+
 class Calculators(object):
-    def __init__(self, calcs_indices: dict):
+    def __init__(self, calcs_indices: dict, n=None):
+        calcs_indices = dict((c_type, _get_default_index(c_type, n) if calcs_indices.get(c_type) is None
+                              else calcs_indices[c_type]) for c_type in CALCULATIONS.keys())
         # self.calcs_indices = calcs_indices
         self.calcs_classes = dict(
-            (c_type, c_list[calcs_indices.get(c_type, 0)]) for c_type, c_list in CALCULATIONS.items())
-        self.name = _get_name(*(calcs_indices.get(c_type, 0) for c_type in (GAP, SUBT_EXTR, CANON, CERTIFICATE)))
+            (c_type, c_list[calcs_indices[c_type]]) for c_type, c_list in CALCULATIONS.items())
+        self.name = _get_name(*(calcs_indices[c_type] for c_type in (GAP, SUBT_EXTR, CANON, CERTIFICATE)))
 
     def get_calculation(self, calc_type, **kwargs):
         return self.calcs_classes[calc_type](**kwargs)
@@ -1,6 +1,9 @@
 from .core import Calculation
 from modules.coding import Coding, Cover
 from modules import var
+from itertools import permutations, product
+from functools import cache
+import numpy as np
 
 
 class CANON_Base(Calculation):
@@ -34,16 +37,67 @@ class CANON_Smart(CANON_Base):
             base_cover = coding_reorder.covers[0]
             for cover_reorder in base_cover.cover_reordering():
                 for trans in Cover(cover_reorder).get_translations():
-                    if coding_reorder.apply_translation(trans) < coding:
+                    if coding_reorder.translation_lt(trans, coding):
                         return False
         return True
 
 
+@cache
+def _get_translations(parts):
+    """All relabellings (as rows) fixing the standard cover of parts: rotations and swaps of cycles of equal length"""
+    starts = tuple(sum(parts[:i]) for i in range(len(parts)))
+    groups_maps = list()
+    for part in sorted(set(parts), reverse=True):
+        slots = tuple(s for s, p in zip(starts, parts) if p == part)
+        groups_maps.append(tuple(tuple((src + j, dst + (rot + j) % part)
+                                       for src, dst, rot in zip(slots, targets, rots) for j in range(part))
+                                 for targets in permutations(slots)
+                                 for rots in product(range(part), repeat=len(slots))))
+    table = np.empty((np.prod(tuple(len(maps) for maps in groups_maps)), sum(parts)), dtype=int)
+    for i, maps in enumerate(product(*groups_maps)):
+        for src, dst in sum(maps, start=tuple()):
+            table[i, src] = dst
+    return table
+
+
+def _translated_covers(translations, cycles):
+    """Cycles relabelled by each translation and sorted as in Cover.sort, flattened (one row per translation)"""
+    rows, blocks = np.arange(len(translations))[:, np.newaxis], list()
+    for part in sorted(set(len(c) for c in cycles), reverse=True):
+        group = np.array(tuple(c for c in cycles if len(c) == part))
+        values = translations[:, group]
+        shift = values.argmin(axis=2)[:, :, np.newaxis]
+        values = values[rows[:, :, np.newaxis], np.arange(len(group))[:, np.newaxis], (shift + np.arange(part)) % part]
+        if len(group) > 1:
+            values = values[rows, values[:, :, 0].argsort(axis=1)]
+        blocks.append(values.reshape((len(translations), -1)))
+    return np.hstack(blocks)
+
+
 class CANON_Quick(CANON_Smart):
-    CALC_NAME = "Quick (external C library)"
+    """
+    Same check as CANON_Smart, but the translations of a base cover come from a table cached per partition and the
+    other cover is relabelled by a whole chunk of them at once. Chunks grow from var.CANON_FIRST_CHUNK rows up to
+    var.CANON_MAX_CHUNK, stopping at the first chunk with a smaller translation.
+    """
+    CALC_NAME = "Quick (translation tables)"
 
     def _canon_calc(self, coding):
-        raise NotImplemented
+        first, second = coding.covers
+        target = np.array(sum(second.cycles, start=tuple()))
+        for base, other in (((first, second),) if first.parts != second.parts else ((first, second), (second, first))):
+            standard = np.argsort(sum(base.cycles, start=tuple()))  # Base cover to the standard one
+            translations = _get_translations(base.parts)
+            start, size = 0, var.CANON_FIRST_CHUNK
+            while start < len(translations):
+                translated = _translated_covers(translations[start:start + size, standard], other.cycles)
+                differ = translated != target
+                first_diff = differ.argmax(axis=1)
+                if np.any(differ.any(axis=1) &
+                          (translated[np.arange(len(translated)), first_diff] < target[first_diff])):
+                    return False
+                start, size = start + size, min(2 * size, var.CANON_MAX_CHUNK)
+        return True
 
 
 CALCULATIONS_LIST = (CANON_Direct,
@@ -1,11 +1,76 @@
 import pynauty
 from .core import Calculation
+from modules.coding import Coding
+from modules.graph import set_nauty_graph
 from modules import var
 
 class CERT_Nauty(Calculation):
     CALC_TYPE = var.CALC_CERTIFICATE
     CALC_NAME = "Nauty"
+
+    def __init__(self, **kwargs):
+        self.nauty_graph = None  # Reused for every coding
+        super().__init__(**kwargs)
+
+    def get_certificate(self, graph):
+        if self.nauty_graph is None:
+            self.nauty_graph = pynauty.Graph(graph.n, directed=True)
+        return pynauty.certificate(set_nauty_graph(self.nauty_graph, graph.n, graph.successors.tolist()))
+
     def _calc(self, graph):
-        return {var.GRAPH_TABLE: {'certificate': pynauty.certificate(graph.nauty_graph)}}
+        return {var.GRAPH_TABLE: {'certificate': self.get_certificate(graph)}}
+
+
+def _get_cover_adjacency(n, covers):
+    """Adjacency of the nauty graph of two covers: arcs (u, v) of the first are kept, of the second are u -> n + u -> v"""
+    adj = dict((u, [n + u, ]) for u in range(n))
+    for cycle in covers[0].cycles:
+        for u, v in zip(cycle, cycle[1:] + cycle[:1]):
+            adj[u].append(v)
+    for cycle in covers[1].cycles:
+        for u, v in zip(cycle, cycle[1:] + cycle[:1]):
+            adj[n + u] = [v, ]
+    return adj
+
+
+class CERT_Canon(CERT_Nauty):
+    """
+    Certificate and CANON in a single stage. The certificate is the one of CERT_Nauty, while a canonical labelling of
+    the covers (one per order if they have the same parts) gives a canonical coding, once its first cover is relabelled
+    to the standard one: the coding is canon if it is that one.
+    """
+    CALC_NAME = "Nauty + canonical coding"
+
+    def __init__(self, k, **kwargs):
+        self.k = k
+        assert k == 2
+        self.cover_graph = None  # Reused for every coding, only the adjacency changes
+        super().__init__(k=k, **kwargs)
+
+    def _canonical_coding(self, n, covers):
+        if self.cover_graph is None:
+            self.cover_graph = pynauty.Graph(2 * n, directed=True, vertex_coloring=[set(range(n, 2 * n)), ])
+        self.cover_graph.set_adjacency_dict(_get_cover_adjacency(n, covers))
+        labels = pynauty.canon_label(self.cover_graph)
+        canon = [0] * n
+        for i, u in enumerate(filter(lambda v: v < n, labels)):
+            canon[u] = i
+        inverse = sorted(range(n), key=canon.__getitem__)
+        standard = [0] * n  # Canonical labelling, then relabelling of the first cover to the standard one
+        for i, u in enumerate(inverse[v] for cycle in covers[0].translated_cycles(canon) for v in cycle):
+            standard[u] = i
+        return Coding(tuple(cover.apply_translation(standard) for cover in covers))
+
+    def canonical_coding(self, graph):
+        first, second = graph.coding.covers
+        if first.parts != second.parts:
+            return self._canonical_coding(graph.n, (first, second))
+        return min(self._canonical_coding(graph.n, (first, second)), self._canonical_coding(graph.n, (second, first)))
+
+    def _calc(self, graph):
+        return {var.GRAPH_TABLE: {'certificate': self.get_certificate(graph),
+                                  'prop_canon': self.canonical_coding(graph) == graph.coding}}
+
 
-CALCULATIONS_LIST = (CERT_Nauty,)
\ No newline at end of file
+CALCULATIONS_LIST = (CERT_Nauty,
+                     CERT_Canon)
\ No newline at end of file
@@ -1,14 +1,52 @@
-import os, time
+import os, time, logging
+import numpy as np
 from modules import var
 
 
+class SharedTable(object):
+    """
+    Constant table of a calculator, built once per n and saved as .npy in var.TABLES_DIR: every worker memory-maps
+    the same read-only file instead of building (and pickling) its own copy.
+    """
+
+    def __init__(self, builder):
+        self.builder = builder
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def load(self, n):
+        path = var.TABLE_FILEPATH.format(name=self.name, n=n)
+        if not os.path.exists(path):
+            logging.warning(f"File for {self.name} (n={n}) not found, generating....")
+            os.makedirs(var.TABLES_DIR, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}"
+            with open(tmp_path, 'wb') as f:
+                np.save(f, self.builder(n))
+            os.replace(tmp_path, path)
+        return np.load(path, mmap_mode='r').view(np.ndarray)
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        table = self.load(instance.n)
+        instance.__dict__[self.name] = table
+        return table
+
+
 class Calculation(object):
     CALC_TYPE = None
     CALC_NAME = None
+    BATCHED = False  # Whether _calc_batch works on a whole GraphBatch at once
 
     def __init__(self, **kwargs):
         # print(f"{os.getpid() - os.getppid():<4} - Initializing calculation {self.CALC_NAME}")
-        pass
+        for name in dir(type(self)):  # In the parent process, so that the workers find the tables already built
+            if isinstance(getattr(type(self), name), SharedTable):
+                getattr(self, name)
+
+    def __getstate__(self):
+        return dict((k, v) for k, v in self.__dict__.items() if not isinstance(getattr(type(self), k, None), SharedTable))
 
     def _initialize(self):
         pass
@@ -30,3 +68,16 @@ class Calculation(object):
         result = self._calc(graph)
         result.update({var.TIMINGS_TABLE: {self.CALC_TYPE: time.process_time_ns() - start}})
         return result
+
+    def _calc_batch(self, batch):
+        return list(self._calc(graph) for row_id, graph in batch)
+
+    def calc_batch(self, batch):
+        if not self.BATCHED:
+            return list((row_id, self.calc(graph)) for row_id, graph in batch)
+        start = time.process_time_ns()
+        results = self._calc_batch(batch)
+        exec_time = (time.process_time_ns() - start) // max(len(batch), 1)
+        for result in results:
+            result.update({var.TIMINGS_TABLE: {self.CALC_TYPE: exec_time}})
+        return list(zip(batch.ids, results))
@@ -1,8 +1,8 @@
 from functools import cache
+import multiprocessing
 import numpy as np
 from more_itertools import powerset
-from .core import Calculation
-import networkx as nx
+from .core import Calculation, SharedTable
 from modules import var
 
 
@@ -21,6 +21,13 @@ def _get_subset_vects(n):
     return vectors
 
 
+def _get_deg_vects(n):
+    base = _get_base(n)
+    out_deg_vects = np.array(tuple(tuple(edge[0] == u for edge in base) for u in range(n)), dtype=np.float32)
+    in_deg_vects = np.array(tuple(tuple(edge[1] == v for edge in base) for v in range(n)), dtype=np.float32)
+    return np.concatenate((out_deg_vects, in_deg_vects), axis=0)
+
+
 class SUBTEXTR_Base(Calculation):
     CALC_TYPE = var.CALC_SUBT_EXTR
     SUBT_CALC_NAME = None
@@ -40,25 +47,51 @@ class SUBTEXTR_Base(Calculation):
         subt, active = self._subt_calc(graph)
         return {var.GRAPH_TABLE: {'prop_subt': subt, 'prop_extr': self._extr_calc(graph, active) if subt else None}}
 
+    def _subt_calc_batch(self, batch):
+        return list(self._subt_calc(graph) for row_id, graph in batch)
+
+    def _extr_calc_batch(self, graphs, actives):
+        return list(self._extr_calc(graph, active) for graph, active in zip(graphs, actives))
+
+    def _calc_batch(self, batch):
+        subts = self._subt_calc_batch(batch)
+        feasible = tuple(i for i, (subt, active) in enumerate(subts) if subt)
+        extrs = dict(zip(feasible, self._extr_calc_batch(tuple(batch.graphs[i] for i in feasible),
+                                                         tuple(subts[i][1] for i in feasible))))
+        return list({var.GRAPH_TABLE: {'prop_subt': bool(subt), 'prop_extr': extrs.get(i)}}
+                    for i, (subt, active) in enumerate(subts))
+
 
 class SUBT_Direct(SUBTEXTR_Base):
+    """
+    Checks the subsets one at a time, stopping at the first violated one. Rejections are counted per subset in an
+    array shared by all the workers, and every var.SUBT_REORDER_INTERVAL graphs the subsets are re-sorted so that
+    the most frequent violators are checked first.
+    """
     SUBT_CALC_NAME = "Direct"
+    subset_vects = SharedTable(_get_subset_vects)
 
     def __init__(self, n, **kwargs):
         self.n = n
         super().__init__(n=n, **kwargs)
-        self.subset_vects = _get_subset_vects(n)
+        subsets = 2 ** n - 2 * n - 2
+        self.rejections = np.frombuffer(multiprocessing.RawArray('q', subsets), dtype=np.int64)
+        self.order, self.checked = list(range(subsets)), 0
 
     def _subt_calc(self, graph):
+        self.checked += 1
+        if self.checked % var.SUBT_REORDER_INTERVAL == 0:
+            self.order = np.argsort(-self.rejections, kind='stable').tolist()
         graph_vect = graph.vector
         active = list()
-        for subs_vect in self.subset_vects:
-            res = np.dot(subs_vect, graph_vect)
+        for i in self.order:
+            res = np.dot(self.subset_vects[i], graph_vect)
             if res < 1.:
+                self.rejections[i] += 1
                 return False, None
             elif res == 1.:
-                active.append(subs_vect)
-        return True, np.array(active)
+                active.append(i)
+        return True, self.subset_vects[sorted(active)]
 
 
 class SUBT_Matrix(SUBT_Direct):
@@ -72,52 +105,220 @@ class SUBT_Matrix(SUBT_Direct):
         return True, active
 
 
+class SUBT_Batch(SUBT_Matrix):
+    SUBT_CALC_NAME = "Batch"
+    BATCHED = True
+
+    def _subt_masks_batch(self, vectors):
+        feasible = np.empty(len(vectors), dtype=bool)
+        active = np.empty((len(vectors), len(self.subset_vects)), dtype=bool)
+        step = max(1, var.SUBT_BATCH_MAX_ELEMENTS // len(self.subset_vects))
+        for i in range(0, len(vectors), step):
+            res = np.matmul(self.subset_vects, vectors[i:i + step].T)
+            feasible[i:i + step] = np.all(res >= 1., axis=0)
+            active[i:i + step] = (res == 1.).T
+        return feasible, active
+
+    def _subt_calc_batch(self, batch):
+        feasible, active = self._subt_masks_batch(batch.vectors)
+        return list((bool(subt), self.subset_vects[mask] if subt else None) for subt, mask in zip(feasible, active))
+
+
+def _get_cut_vects(n, subsets):
+    """Subset vectors (as in _get_subset_vects) of the given bitmasks, in powerset order"""
+    subsets = sorted(subsets, key=lambda s: (s.bit_count(), tuple(i for i in range(n) if s >> i & 1)))
+    base = _get_base(n)
+    in_subset = (np.array(subsets, dtype=int)[:, np.newaxis] >> np.arange(n)) & 1 == 1
+    return (in_subset[:, base[:, 0]] & ~in_subset[:, base[:, 1]]).astype(np.float32).reshape(len(subsets), len(base))
+
+
+class SUBT_Incremental(SUBTEXTR_Base):
+    """
+    Cut values k * x(d+(S)) for the subsets S not containing the last node, built one node j at a time from the
+    integer multiplicities: k * x(d+(S + j)) = k * x(d+(S)) + k - sum_{v in S} (m_jv + m_vj). Since every node has in-
+    and out-degree k, the cut of V - S equals the one of S. Smaller subsets are checked first and no 2^n x n(n-1)
+    matrix is needed.
+    """
+    SUBT_CALC_NAME = "Incremental"
+
+    def __init__(self, n, k, **kwargs):
+        self.n, self.k = n, k
+        super().__init__(n=n, k=k, **kwargs)
+
+    def _subt_calc(self, graph):
+        sym_mult = graph.multiplicity.astype(np.int16) + graph.multiplicity.T
+        half = 1 << (self.n - 1)
+        cuts, sums = np.zeros(half, dtype=np.int16), np.zeros((half, self.n), dtype=np.int16)
+        for j in range(self.n - 1):
+            new_cuts = cuts[1 << j:2 << j]
+            np.subtract(cuts[:1 << j] + self.k, sums[:1 << j, j], out=new_cuts)
+            if new_cuts.min() < self.k:  # Singletons (and their complements) always have cut k
+                return False, None
+            np.add(sums[:1 << j], sym_mult[j], out=sums[1 << j:2 << j])
+        tight = np.flatnonzero(cuts == self.k)
+        tight = tight[(tight & (tight - 1) != 0) & (tight != half - 1)].tolist()
+        full = (1 << self.n) - 1
+        return True, _get_cut_vects(self.n, tight + list(full ^ s for s in tight))
+
+
+def _max_flow(capacity, source, sink, limit):
+    """
+    Augmenting paths (BFS) on a dense integer capacity matrix, stopping as soon as the flow reaches limit. Returns the
+    flow value and the residual capacities.
+    """
+    residual = list(list(row) for row in capacity)
+    nodes, flow = range(len(capacity)), 0
+    while flow < limit:
+        parent = [-1] * len(capacity)
+        parent[source], queue = source, [source]
+        for u in queue:
+            for v in nodes:
+                if parent[v] < 0 and residual[u][v] > 0:
+                    parent[v] = u
+                    queue.append(v)
+            if parent[sink] >= 0:
+                break
+        if parent[sink] < 0:
+            break
+        path, v = list(), sink
+        while v != source:
+            path.append((parent[v], v))
+            v = parent[v]
+        augment = min(residual[u][v] for u, v in path)
+        for u, v in path:
+            residual[u][v] -= augment
+            residual[v][u] += augment
+        flow += augment
+    return flow, residual
+
+
+def _get_reach(arcs):
+    """Bitmasks of the nodes reachable from each node (itself included), given the arcs bitmasks"""
+    reach = list(a | 1 << u for u, a in enumerate(arcs))
+    for w in range(len(arcs)):
+        for u in range(len(arcs)):
+            if reach[u] >> w & 1:
+                reach[u] |= reach[w]
+    return reach
+
+
+def _closed_sets(reach, back_reach, included, excluded, full):
+    """All the sets containing included, disjoint from excluded and closed under reach"""
+    free = full & ~(included | excluded)
+    if free == 0:
+        yield included
+        return
+    u = (free & -free).bit_length() - 1
+    if reach[u] & excluded == 0:
+        yield from _closed_sets(reach, back_reach, included | reach[u], excluded, full)
+    if back_reach[u] & included == 0:
+        yield from _closed_sets(reach, back_reach, included, excluded | back_reach[u], full)
+
+
 class SUBT_MinCut(SUBTEXTR_Base):
+    """
+    Max-flows from node 0 to every other node on the integer multiplicities: since in- and out-cuts of every subset
+    coincide, n - 1 flows are enough. A subset is tight if it is a minimum 0-v cut of value k, i.e. a set containing
+    0 but not v closed in the residual graph: these are enumerated directly, without the 2^n subsets table.
+    """
     SUBT_CALC_NAME = "MinCut"
 
     def __init__(self, n, k, **kwargs):
         self.n, self.k = n, k
         super().__init__(n=n, k=k, **kwargs)
-        self.subset_vects = _get_subset_vects(n)
 
     def _subt_calc(self, graph):
-        digraph = graph.weighted_digraph
-        for u in digraph.nodes:
-            for v in digraph.nodes:
-                if u == v:
-                    continue
-                new_val, new_cut = nx.minimum_cut(digraph, u, v, capacity='weight')
-                if new_val < self.k:
-                    return False, None
-        active = self.subset_vects[np.matmul(self.subset_vects, graph.vector) == 1., :]
-        return True, active
+        capacity = graph.multiplicity.tolist()
+        full, tight = (1 << self.n) - 1, set()
+        for v in range(1, self.n):
+            flow, residual = _max_flow(capacity, 0, v, self.k + 1)
+            if flow < self.k:
+                return False, None
+            if flow > self.k:
+                continue
+            arcs = list(sum(1 << w for w, c in enumerate(row) if c > 0) for row in residual)
+            back_arcs = list(sum(1 << u for u, row in enumerate(residual) if row[w] > 0) for w in range(self.n))
+            reach, back_reach = _get_reach(arcs), _get_reach(back_arcs)
+            tight.update(_closed_sets(reach, back_reach, reach[0], back_reach[v], full))
+        tight = list(s for s in tight if 2 <= s.bit_count() <= self.n - 2)
+        return True, _get_cut_vects(self.n, tight + list(full ^ s for s in tight))
+
+
+def _modular_rank(matrix, target, prime=var.EXTR_RANK_PRIME):
+    """
+    Rank of an integer matrix over GF(prime), by fraction-free Gaussian elimination, stopping once target is reached.
+    It never exceeds the rational rank, so reaching target is exact. Rows are plain lists: on these small matrices
+    numpy call overhead would dominate.
+    """
+    rows = list(row for row in matrix.tolist() if any(row))
+    rank = 0
+    for col in range(matrix.shape[1]):
+        pivot = next((row for row in rows if row[col]), None)
+        if pivot is None:
+            continue
+        pivot_val = pivot[col]
+        rows = list(list((a * pivot_val - factor * b) % prime for a, b in zip(row, pivot)) if (factor := row[col]) else row
+                    for row in rows if row is not pivot)
+        rank += 1
+        if rank == target or len(rows) < target - rank:
+            break
+    return rank
+
+
+def _modular_rank_batch(matrices, prime=var.EXTR_RANK_PRIME):
+    """Ranks over GF(prime) of a stack of integer matrices (zero-padded to the same shape), eliminated all at once"""
+    rows = matrices % prime
+    batch = np.arange(len(rows))
+    ranks = np.zeros(len(rows), dtype=int)
+    for col in range(rows.shape[2]):
+        column = rows[:, :, col]
+        nonzero = column != 0
+        has_pivot = nonzero.any(axis=1)
+        pivots = rows[batch, nonzero.argmax(axis=1)]
+        pivot_vals = np.where(has_pivot, pivots[:, col], 1)
+        rows = (rows * pivot_vals[:, np.newaxis, np.newaxis] -
+                column[:, :, np.newaxis] * pivots[:, np.newaxis, :]) % prime
+        ranks += has_pivot
+    return ranks
 
 
 class EXTR_Matrix(SUBTEXTR_Base):
+    """
+    The bounds x_e >= 0 active on the graph are unit rows spanning the columns with x_e = 0, and each edge with x_e = 1
+    gets a unit row from the degree row of its tail: the full matrix has rank n(n-1) iff the degree and active subset
+    rows, restricted to the edges with 0 < x_e < 1, have full column rank.
+    """
     EXTR_CALC_NAME = "Matrix"
+    BATCHED = True
+    deg_vects = SharedTable(_get_deg_vects)
 
     def __init__(self, n, **kwargs):
         self.n = n
         self.base = _get_base(n)
         super().__init__(n=n, **kwargs)
-        self.bound_vects = np.identity((n * (n - 1)), dtype=np.float32)
-        out_deg_vects = np.array(tuple(tuple(edge[0] == u for edge in self.base) for u in range(n)),
-                                 dtype=np.float32)
-        in_deg_vects = np.array(tuple(tuple(edge[1] == v for edge in self.base) for v in range(n)),
-                                dtype=np.float32)
-        self.deg_vects = np.concatenate((out_deg_vects, in_deg_vects), axis=0)
+
+    def _get_extr_matrix(self, graph, active_vects):
+        fractional = (graph.vector > 0.) & (graph.vector < 1.)
+        matrix = np.vstack((self.deg_vects[:, fractional], active_vects[:, fractional])).astype(np.int64)
+        return int(np.count_nonzero(fractional)), matrix
 
     def _extr_calc(self, graph, active_vects):
-        active_bounds = self.bound_vects[graph.vector == 0., :]
-        # print(
-        #     f"\t\tprank {np.linalg.matrix_rank(np.vstack((active_bounds, self.deg_vects)))}/{(self.n * (self.n - 1))}")
-        try:
-            full_matrix = np.vstack((active_bounds, self.deg_vects, active_vects))
-        except ValueError:
-            return False
-        rank = np.linalg.matrix_rank(full_matrix)
-        # print(f"\t\trank  {rank}/{(self.n * (self.n - 1))}")
-        return rank == (self.n * (self.n - 1))
+        target, matrix = self._get_extr_matrix(graph, active_vects)
+        return target == 0 or _modular_rank(matrix, target) == target
+
+    def _extr_calc_batch(self, graphs, actives):
+        results, groups = [True] * len(graphs), dict()
+        for i, (graph, active_vects) in enumerate(zip(graphs, actives)):
+            target, matrix = self._get_extr_matrix(graph, active_vects)
+            if target > 0:
+                groups.setdefault(target, list()).append((i, matrix))
+        for target, items in groups.items():  # Same number of columns, rows padded with zeros
+            stacked = np.zeros((len(items), max(len(matrix) for i, matrix in items), target), dtype=np.int64)
+            for j, (i, matrix) in enumerate(items):
+                stacked[j, :len(matrix)] = matrix
+            for (i, matrix), rank in zip(items, _modular_rank_batch(stacked).tolist()):
+                results[i] = rank == target
+        return results
 
 
 # class EXTR_QuickMatrix(EXTR_Matrix):
@@ -128,85 +329,17 @@ class EXTR_Matrix(SUBTEXTR_Base):
 #             return True
 #         return super()._extr_calc(graph, active_vects)
 
-# def pprint_ant(ants, gr, start="\t"):
-#     if gr is None:
-#         print(f"{start}        [{', '.join(str(s) for s in ants)}]")
-#         return
-#     print(f"{start}{gr}  [{', '.join(str(s) for s in ants[gr])}]")
-#
-#
-# def add_antagonists_print(antagonists, exhausted, *groups):
-#     if groups[0] == groups[1]:
-#         # add_exhaust = groups[0]
-#         iterator = (groups,)
-#         # antagonists[gr].update(*(antagonists[gr] for gr in antagonists[gr])
-#         # for g in antagonists[gr]:
-#         #     antagonists[g] = antagonists[gr]
-#     else:
-#         exh_gr = set(groups).intersection(exhausted)
-#         if len(exh_gr) > 0:
-#             print(f"\n----  EXHAUST CASE  ----")
-#             exh_gr, act_gr = exh_gr.pop(), set(groups).difference(exhausted).pop()
-#             pprint_ant(antagonists, exh_gr, start="EXH ")
-#             pprint_ant(antagonists, act_gr, start="ACT ")
-#             # for gr in antagonists[act_gr]:
-#             #     antagonists[exh_gr].update(antagonists[gr])
-#             #     break
-#             antagonists[act_gr].add(act_gr)
-#             # add_exhaust = act_gr
-#             pprint_ant(antagonists, act_gr, start="--> ")
-#             iterator = ((exh_gr, act_gr),)
-#         else:
-#             # add_exhaust = None
-#             iterator = (groups, groups[::-1])
-#     for A, B in iterator:
-#         print(f"\n----  A {A}\tB {B}  ----")
-#         pprint_ant(antagonists, A, start="  A ")
-#         pprint_ant(antagonists, B, start="  B ")
-#         for gr in antagonists[B]:
-#             pprint_ant(antagonists, gr)
-#         #     antagonists[A].update(antagonists[gr])
-#         #     break
-#         antagonists[A].update(*(antagonists[gr] for gr in antagonists[B]))
-#         pprint_ant(antagonists, A, start="NEW ")
-#
-#     print(f"\n--------  UPDATE  --------")
-#     for A, B in iterator:
-#         pprint_ant(antagonists, B, start="FRM ")
-#         new_ants = antagonists[A]
-#         for gr in antagonists[B]:
-#             pprint_ant(antagonists, gr)
-#             antagonists[gr] = new_ants
-#         pprint_ant(antagonists, A, start=" TO ")
-#         if A in new_ants:
-#             exhausted.update(new_ants)
-#     # if add_exhaust is not None:
-#     #     add_exhausted(antagonists, exhausted, add_exhaust)
-
-
-def add_exhausted(antagonists, exhausted, group):
-    exhausted.update({group, }, antagonists[group])
-
-
-def add_antagonists(antagonists, exhausted, *groups):
-    if groups[0] == groups[1]:
-        iterator = (groups,)
-    else:
-        exh_gr = set(groups).intersection(exhausted)
-        if len(exh_gr) > 0:
-            exh_gr, act_gr = exh_gr.pop(), set(groups).difference(exhausted).pop()
-            antagonists[act_gr].add(act_gr)
-            iterator = ((exh_gr, act_gr),)
-        else:
-            iterator = (groups, groups[::-1])
-    for A, B in iterator:
-        antagonists[A].update(*(antagonists[gr] for gr in antagonists[B]))
-    for A, B in iterator:
-        new_ants = antagonists[A]
-        for gr in antagonists[B]:
-            antagonists[gr] = new_ants
-        if A in new_ants:
-            exhausted.update(new_ants)
+def _find(parent, parity, x):
+    """Root of x in a union-find with parity, compressing the path (parity[x] becomes relative to the root)"""
+    path = list()
+    while parent[x] != x:
+        path.append(x)
+        x = parent[x]
+    rel = 0
+    for y in reversed(path):
+        rel ^= parity[y]
+        parent[y], parity[y] = x, rel
+    return x
 
 
 class EXTR_Chain(SUBTEXTR_Base):
@@ -217,53 +350,54 @@ class EXTR_Chain(SUBTEXTR_Base):
         assert k == 2
         self.base = _get_base(n)
         super().__init__(n=n, k=k, **kwargs)
-        self.bound_vects = np.identity((n * (n - 1)), dtype=np.float32)
-        out_deg_vects = np.array(tuple(tuple(edge[0] == u for edge in self.base) for u in range(n)),
-                                 dtype=np.float32)
-        in_deg_vects = np.array(tuple(tuple(edge[1] == v for edge in self.base) for v in range(n)),
-                                dtype=np.float32)
-        self.deg_vects = np.concatenate((out_deg_vects, in_deg_vects), axis=0)
-
-    def get_groups(self, graph_vect):
-        support = set(tuple(i) for i in self.base[graph_vect == .5, :])
-        groups, current = dict(), 0
-        while len(support) > 0:
-            last = support.pop()
-            while True:
-                groups[last] = (current, 0)
-                inter = next(filter(lambda x: x[0] == last[0], support))
-                support.remove(inter)
-                groups[inter] = (current, 1)
-                try:
-                    last = next(filter(lambda x: x[1] == inter[1], support))
-                except StopIteration:
-                    break
-                support.remove(last)
+
+    def get_groups(self, graph):
+        """
+        Group (alternating cycle of the two covers) of every node whose successors differ, -1 elsewhere.
+        Each half-weighted arc belongs to the group of its tail, with parity given by its cover.
+        """
+        first, second = graph.successors.tolist()
+        inverse = [0] * self.n
+        for u, v in enumerate(first):
+            inverse[v] = u
+        groups, current = [-1] * self.n, 0
+        for start in range(self.n):
+            if groups[start] >= 0 or first[start] == second[start]:
+                continue
+            node = start
+            while groups[node] < 0:
+                groups[node] = current
+                node = inverse[second[node]]
             current += 1
-        return groups, current
+        return np.array(groups), current
 
     def _extr_calc(self, graph, active_vects):
-        graph_vect = graph.vector
-        groups, counter = self.get_groups(graph_vect)
-        antagonists = dict(((gr, ind), {(gr, ind ^ 1), }) for gr in range(counter) for ind in (0, 1))
-        exhausted = set()
-        # print(f"\t\tgroup {group}")
-        # i, j = 0, 0
-        for vect in active_vects:
-            # j += 1
-            try:
-                edge_1, edge_2 = self.base[np.multiply(vect, graph_vect) == .5, :]
-            except ValueError:
-                # i += 1
-                continue
-            group_1, group_2 = groups[tuple(edge_1)], groups[tuple(edge_2)]
-            if group_2 not in antagonists[group_1] and (group_1 not in exhausted or group_2 not in exhausted):
-                counter -= 1
-                if counter == 0:
-                    # return i, j
-                    return True
-                add_antagonists(antagonists, exhausted, group_1, group_2)
-        # return i, j
+        groups, counter = self.get_groups(graph)
+        if counter == 0:
+            return True
+        half = np.flatnonzero(graph.vector == .5)
+        tails, heads = self.base[half, 0], self.base[half, 1]
+        arc_groups = groups[tails].tolist()
+        arc_parity = (heads != graph.successors[0, tails]).astype(int).tolist()
+        crossing = active_vects[:, half] > 0.
+        pairs = np.nonzero(crossing[np.count_nonzero(crossing, axis=1) == 2])[1].reshape((-1, 2))
+        parent, parity, pinned = list(range(counter)), [0] * counter, [False] * counter
+        for arc_1, arc_2 in pairs.tolist():  # Tight cut: the two arcs' deviations must cancel out
+            group_1, group_2 = arc_groups[arc_1], arc_groups[arc_2]
+            root_1, root_2 = _find(parent, parity, group_1), _find(parent, parity, group_2)
+            sign = parity[group_1] ^ parity[group_2] ^ arc_parity[arc_1] ^ arc_parity[arc_2]
+            if root_1 == root_2:
+                if sign == 1 or pinned[root_1]:
+                    continue
+                pinned[root_1] = True
+            else:
+                if pinned[root_1] and pinned[root_2]:
+                    continue
+                parent[root_1], parity[root_1] = root_2, sign ^ 1
+                pinned[root_2] = pinned[root_2] or pinned[root_1]
+            counter -= 1
+            if counter == 0:
+                return True
         return False
 
 
@@ -294,6 +428,14 @@ class SUBTEXTR_Matrix_Chain(SUBT_Matrix, EXTR_Chain):
     CALC_NAME = _get_calc_name(SUBT_Matrix, EXTR_Chain)
 
 
+class SUBTEXTR_Batch_Matrix(SUBT_Batch, EXTR_Matrix):
+    CALC_NAME = _get_calc_name(SUBT_Batch, EXTR_Matrix)
+
+
+class SUBTEXTR_Batch_Chain(SUBT_Batch, EXTR_Chain):
+    CALC_NAME = _get_calc_name(SUBT_Batch, EXTR_Chain)
+
+
 class SUBTEXTR_MinCut_Matrix(SUBT_MinCut, EXTR_Matrix):
     CALC_NAME = _get_calc_name(SUBT_MinCut, EXTR_Matrix)
 
@@ -306,6 +448,14 @@ class SUBTEXTR_MinCut_Chain(SUBT_MinCut, EXTR_Chain):
     CALC_NAME = _get_calc_name(SUBT_MinCut, EXTR_Chain)
 
 
+class SUBTEXTR_Incremental_Chain(SUBT_Incremental, EXTR_Chain):
+    CALC_NAME = _get_calc_name(SUBT_Incremental, EXTR_Chain)
+
+
+class SUBTEXTR_Incremental_Matrix(SUBT_Incremental, EXTR_Matrix):
+    CALC_NAME = _get_calc_name(SUBT_Incremental, EXTR_Matrix)
+
+
 CALCULATIONS_LIST = (SUBTEXTR_Matrix_Chain,  # 1
                      # SUBTEXTR_Matrix_QuickMatrix,  # 3
                      SUBTEXTR_Matrix_Matrix,  # 5
@@ -314,7 +464,11 @@ CALCULATIONS_LIST = (SUBTEXTR_Matrix_Chain,  # 1
                      SUBTEXTR_Direct_Matrix,  # 6
                      SUBTEXTR_MinCut_Chain,
                      # SUBTEXTR_MinCut_QuickMatrix,
-                     SUBTEXTR_MinCut_Matrix,)
+                     SUBTEXTR_MinCut_Matrix,
+                     SUBTEXTR_Batch_Chain,
+                     SUBTEXTR_Batch_Matrix,
+                     SUBTEXTR_Incremental_Chain,
+                     SUBTEXTR_Incremental_Matrix,)
 
 # n = 10
 # 5. Matrix + Chain
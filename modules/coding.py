@@ -1,4 +1,4 @@
-from itertools import permutations
+from itertools import permutations, zip_longest
 import numpy as np
 import modules.utility as utl
 
@@ -14,6 +14,8 @@ def cover_components_reordering(components, parts):
 
 
 class Coding(object):
+    __slots__ = ('covers',)
+
     def __init__(self, covers):
         self.covers = covers
 
@@ -23,15 +25,29 @@ class Coding(object):
     def __iter__(self):
         return iter(self.covers)
 
+    def __eq__(self, other):
+        return self.covers == other.covers
+
+    def __hash__(self):
+        return hash(self.covers)
+
     def __lt__(self, other):
         for c_1, c_2 in zip(self.covers, other.covers):
-            if c_1 == c_2:
-                continue
-            return c_1 < c_2
+            if c_1 != c_2:
+                return c_1 < c_2
+        return False
 
     def apply_translation(self, translation):
         return Coding(tuple(cover.apply_translation(translation) for cover in self.covers))
 
+    def translation_lt(self, translation, other):
+        """Same as self.apply_translation(translation) < other, stopping at the first differing cycle"""
+        for cover, other_cover in zip(self.covers, other.covers):
+            for cycle, other_cycle in zip_longest(cover.translated_cycles(translation), other_cover.cycles):
+                if cycle != other_cycle:
+                    return other_cycle is not None and (cycle is None or cycle < other_cycle)
+        return False
+
     def code_reordering(self, components=None):
         components = components if components is not None else self.covers
         if len(components) == 0:
@@ -52,7 +68,7 @@ class Coding(object):
             base_cover = next(iter(coding_reorder))
             for cover_reorder in base_cover.cover_reordering():
                 for trans in Cover(cover_reorder).get_translations():
-                    if coding_reorder.apply_translation(trans) < self:
+                    if coding_reorder.translation_lt(trans, self):
                         return False
         return True
 
@@ -78,11 +94,19 @@ class Coding(object):
         return tuple(c.to_save() for c in self.covers)
 
 
+def _rotate(cycle):
+    """Cycle starting from its minimum"""
+    start = cycle.index(min(cycle))
+    return cycle[start:] + cycle[:start]
+
+
 class Cover(object):
+    __slots__ = ('cycles', 'parts', 'weight', '_successors')
+
     def __init__(self, cycles=None, weight=1):
-        self.cycles, self.parts, self.weight = tuple(), tuple(), weight
-        for c in cycles or tuple():
-            self.add_cycle(c)
+        self.cycles = tuple(_rotate(c) for c in cycles) if cycles else tuple()
+        self.parts = tuple(len(c) for c in self.cycles)
+        self.weight, self._successors = weight, None
         # assert all(x >= y for x, y in zip(self.parts, self.parts[1:]))
 
     def __iter__(self):
@@ -91,16 +115,30 @@ class Cover(object):
     def __eq__(self, other):
         return self.cycles == other.cycles
 
+    def __hash__(self):
+        return hash(self.cycles)
+
     def __lt__(self, other):
         return self.cycles < other.cycles
 
+    @property
+    def successors(self):
+        """Array of the successor of each node in its cycle"""
+        if self._successors is None:
+            succ = np.empty(sum(self.parts), dtype=int)
+            for cycle in self.cycles:
+                succ[list(cycle)] = cycle[1:] + cycle[:1]
+            self._successors = succ
+        return self._successors
+
     def add_cycle(self, cycle):
-        start = np.argmin(cycle)
-        self.cycles += (cycle[start:] + cycle[:start],)
+        self.cycles += (_rotate(cycle),)
         self.parts += (len(cycle),)
+        self._successors = None
 
     def sort(self):
         self.cycles = tuple(sorted(self.cycles, key=lambda x: (-len(x), *x)))
+        self.parts = tuple(len(c) for c in self.cycles)
 
     def is_sorted(self):
         return all((-len(x), *x) < (-len(y), *y) for x, y in zip(self.cycles, self.cycles[1:]))
@@ -128,11 +166,14 @@ class Cover(object):
                 yield tail_tr
 
     def apply_translation(self, translation):
-        new_cover = Cover(weight=self.weight)
-        for cycle in self.cycles:
-            new_cover.add_cycle(tuple(translation[i] for i in cycle))
-        new_cover.sort()
-        return new_cover
+        return Cover(cycles=self.translated_cycles(translation), weight=self.weight)
+
+    def translated_cycles(self, translation):
+        """Cycles of self.apply_translation(translation), lazily and in sorted order"""
+        for _, low, cycle in sorted((-len(c), min(translation[i] for i in c), c) for c in self.cycles):
+            values = tuple(translation[i] for i in cycle)
+            start = values.index(low)
+            yield values[start:] + values[:start]
 
     def __repr__(self):
         return utl.seqence_to_str(self.cycles)
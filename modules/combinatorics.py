@@ -1,6 +1,9 @@
-from itertools import permutations, combinations
-from functools import cache
+from itertools import permutations, combinations, islice
+from functools import cache, lru_cache
+from math import comb, factorial, prod
 from modules import var
+from modules.coding import Coding, Cover
+import pynauty
 
 import json
 import logging
@@ -35,76 +38,396 @@ def manual_partitions_generator(n, k=2):
         yield tuple(p_1), tuple(p_2)
 
 
+def _completions_count(head, succ, prefix):
+    """Counts the orderings of head[1:] extending prefix to a cycle that avoids the arcs (v, succ[v])."""
+    remaining = tuple(v for v in head if v not in prefix)
+    m = len(remaining) + 1
+    forbidden = dict()
+    if succ is not None:
+        top, last, nodes = prefix[0], prefix[-1], set(remaining)
+        for u, v in ((u, succ[u]) for u in remaining + (last,)):
+            if v in nodes or v == top:
+                forbidden[top if u == last else u] = v
+    poly, closed_full = [1], False
+    starts = set(forbidden).difference(forbidden.values())
+    visited = set()
+    for u in tuple(starts) + tuple(forbidden):
+        if u in visited:
+            continue
+        arcs, closed, v = 0, u not in starts, u
+        while v in forbidden and not (arcs > 0 and v == u):
+            visited.add(v)
+            v, arcs = forbidden[v], arcs + 1
+        visited.add(v)
+        closed_full = closed_full or (closed and arcs == m)
+        comp = tuple(comb(arcs, j) for j in range(arcs + 1 - closed))
+        poly = [sum(poly[i] * comp[j - i] for i in range(len(poly)) if 0 <= j - i < len(comp))
+                for j in range(len(poly) + len(comp) - 1)]
+    return sum((-1) ** j * c * factorial(m - j - 1) for j, c in enumerate(poly) if j < m) + (
+        (-1) ** m if closed_full else 0)
+
+
+def _heads_count(head, succ):
+    return _completions_count(head, succ, head[:1])
+
+
+def _unrank_head(head, succ, index):
+    prefix = head[:1]
+    while len(prefix) < len(head):
+        for v in head[1:]:
+            if v in prefix or (succ is not None and succ[prefix[-1]] == v):
+                continue
+            count = _completions_count(head, succ, prefix + (v,))
+            if index < count:
+                prefix += (v,)
+                break
+            index -= count
+    return prefix
+
+
+def _rank_head(head, cycle, succ):
+    index = 0
+    for i in range(1, len(cycle)):
+        for v in head[1:]:
+            if v == cycle[i]:
+                break
+            if v in cycle[:i] or (succ is not None and succ[cycle[i - 1]] == v):
+                continue
+            index += _completions_count(head, succ, cycle[:i] + (v,))
+    return index
+
+
 @cache
-def cycles(nodes, parts, minimum=None):
+def _cycles_count(nodes, parts, succ=None, minimum=None):
+    if len(parts) == 0:
+        return 1
+    min_check = minimum is not None and parts[0] == minimum[0]
+    total = 0
+    for head in combinations(nodes, parts[0]):
+        if min_check and head[0] < minimum[1]:
+            continue
+        total += _heads_count(head, succ) * _cycles_count(nodes.difference(head), parts[1:], succ=succ,
+                                                          minimum=(parts[0], head[0]))
+    return total
+
+
+def _locate(nodes, parts, succ, minimum, index):
+    min_check = minimum is not None and parts[0] == minimum[0]
+    for head in combinations(nodes, parts[0]):
+        if min_check and head[0] < minimum[1]:
+            continue
+        reminder = nodes.difference(head)
+        heads = _heads_count(head, succ)
+        block = heads * _cycles_count(reminder, parts[1:], succ=succ, minimum=(parts[0], head[0]))
+        if index < block:
+            return head, reminder, heads, index
+        index -= block
+    raise IndexError
+
+
+def _unrank_cycles(nodes, parts, succ, index, minimum=None):
     if len(parts) == 0:
-        return (tuple(),)
+        return tuple()
+    head, reminder, heads, index = _locate(nodes, parts, succ, minimum, index)
+    tail_index, head_index = divmod(index, heads)
+    return (_unrank_head(head, succ, head_index),
+            *_unrank_cycles(reminder, parts[1:], succ, tail_index, minimum=(parts[0], head[0])))
+
+
+def _rank_cycles(nodes, parts, succ, c_2, minimum=None):
+    if len(parts) == 0:
+        return 0
     min_check = minimum is not None and parts[0] == minimum[0]
-    result = tuple()
+    index, cycle = 0, c_2[0]
+    for head in combinations(nodes, parts[0]):
+        if min_check and head[0] < minimum[1]:
+            continue
+        reminder = nodes.difference(head)
+        heads = _heads_count(head, succ)
+        if set(head) == set(cycle):
+            tail_index = _rank_cycles(reminder, parts[1:], succ, c_2[1:], minimum=(parts[0], head[0]))
+            return index + tail_index * heads + _rank_head(head, cycle, succ)
+        index += heads * _cycles_count(reminder, parts[1:], succ=succ, minimum=(parts[0], head[0]))
+    raise ValueError
+
+
+def _skip(nodes, parts, succ, minimum, skip):
+    if skip == 0:
+        return None, 0, 0
+    head, _, heads, index = _locate(nodes, parts, succ, minimum, skip)
+    return head, *divmod(index, heads)
+
+
+def _cycles(nodes, parts, minimum=None, skip=0):
+    min_check = minimum is not None and parts[0] == minimum[0]
+    first, tail_skip, chunk_skip = _skip(nodes, parts, None, minimum, skip)
     for head in combinations(nodes, parts[0]):
         top = head[0]
         if min_check and top < minimum[1]:
             continue
+        if first is not None:
+            if head != first:
+                continue
+            first = None
         perms = tuple(permutations(head[1:]))
         reminder = nodes.difference(head)
-        result += sum(
-            (tuple(((top, *chunk), *tail) for chunk in perms) for tail in
-             cycles(reminder, parts[1:], minimum=(parts[0], top))),
-            start=tuple())
-    return result
+        for tail in cycles(reminder, parts[1:], minimum=(parts[0], top), skip=tail_skip):
+            for chunk in perms[chunk_skip:]:
+                yield ((top, *chunk), *tail)
+            chunk_skip = 0
+        tail_skip = 0
 
 
-@cache
-def get_non_integer(head, succ, part):
-    n_heads = tuple()
-    perms = tuple(permutations(head[1:]))
-    for chunk in perms:
+@lru_cache(maxsize=var.CYCLES_CACHE_SIZE)
+def _small_cycles(nodes, parts, minimum=None):
+    return tuple(_cycles(nodes, parts, minimum=minimum))
+
+
+def cycles(nodes, parts, minimum=None, skip=0):
+    if len(parts) == 0:
+        yield tuple()
+        return
+    if len(nodes) <= var.CYCLES_CACHE_NODES:
+        yield from _small_cycles(nodes, parts, minimum=minimum)[skip:]
+    else:
+        yield from _cycles(nodes, parts, minimum=minimum, skip=skip)
+
+
+def _non_integer(head, succ, part):
+    for chunk in permutations(head[1:]):
         n_head = (head[0], *chunk)
         if all(n_head[(i + 1) % part] != succ[v] for i, v in enumerate(n_head)):
-            # print(f"\t\t\t{n_head} - YES")
-            n_heads += (n_head,)
-        # else:
-        #     print(f"\t\t\t{n_head} - NO")
-    return n_heads
+            yield n_head
 
 
-@cache
-def cycles_no_integer(nodes, parts, succ, minimum=None):
-    if len(parts) == 0:
-        return (tuple(),)
+@lru_cache(maxsize=var.CYCLES_CACHE_SIZE)
+def _small_non_integer(head, succ, part):
+    return tuple(_non_integer(head, succ, part))
+
+
+def get_non_integer(head, succ, part):
+    if part <= var.CYCLES_CACHE_NODES:
+        return _small_non_integer(head, succ, part)
+    return _non_integer(head, succ, part)
+
+
+def _cycles_no_integer(nodes, parts, succ, minimum=None, skip=0):
     min_check = minimum is not None and parts[0] == minimum[0]
-    result = tuple()
+    first, tail_skip, chunk_skip = _skip(nodes, parts, succ, minimum, skip)
     for head in combinations(nodes, parts[0]):
         top = head[0]
         if min_check and top < minimum[1]:
             continue
+        if first is not None:
+            if head != first:
+                continue
+            first = None
         reminder = nodes.difference(head)
-        result += sum(
-            (tuple((n_head, *tail) for n_head in get_non_integer(head, succ, parts[0])) for tail in
-             cycles_no_integer(reminder, parts[1:], succ=succ, minimum=(parts[0], top))),
-            start=tuple())
-    return result
+        for tail in cycles_no_integer(reminder, parts[1:], succ=succ, minimum=(parts[0], top), skip=tail_skip):
+            for n_head in islice(get_non_integer(head, succ, parts[0]), chunk_skip, None):
+                yield (n_head, *tail)
+            chunk_skip = 0
+        tail_skip = 0
+
+
+@lru_cache(maxsize=var.CYCLES_CACHE_SIZE)
+def _small_cycles_no_integer(nodes, parts, succ, minimum=None):
+    return tuple(_cycles_no_integer(nodes, parts, succ=succ, minimum=minimum))
+
+
+def cycles_no_integer(nodes, parts, succ, minimum=None, skip=0):
+    if len(parts) == 0:
+        yield tuple()
+        return
+    if len(nodes) <= var.CYCLES_CACHE_NODES:
+        yield from _small_cycles_no_integer(nodes, parts, succ=succ, minimum=minimum)[skip:]
+    else:
+        yield from _cycles_no_integer(nodes, parts, succ=succ, minimum=minimum, skip=skip)
+
+
+def _clear_caches():
+    for func in (_small_cycles, _small_non_integer, _small_cycles_no_integer, _cycles_count):
+        func.cache_clear()
 
 
-def codings_generator(n, parts, gen_type, k=2):
+def _partial_nauty_graph(n, covers):
+    adj, colors, vertex = dict((u, list()) for u in range(n)), list(), n
+    for cover in covers:
+        color = set()
+        for cycle in cover:
+            for i, u in enumerate(cycle):
+                adj[u].append(vertex)
+                adj[vertex] = [cycle[(i + 1) % len(cycle)], ]
+                color.add(vertex)
+                vertex += 1
+        colors.append(color)
+    return pynauty.Graph(vertex, directed=True, adjacency_dict=adj, vertex_coloring=[set(range(n)), *colors])
+
+
+def _is_canonical_augmentation(n, graph, c_2):
+    last = set(u for cycle in c_2 if len(cycle) == len(c_2[-1]) for u in cycle)
+    canon_node = next(u for u in pynauty.canon_label(graph) if u in last)
+    orbits = pynauty.autgrp(graph)[3]
+    return orbits[canon_node] in set(orbits[u] for u in c_2[-1])
+
+
+def _orderly_cycles(n, nodes, c_1, parts, succ, c_2=tuple()):
+    if len(parts) == 0:
+        yield c_2
+        return
+    children = set()
+    for head in combinations(sorted(nodes), parts[0]):
+        reminder = nodes.difference(head)
+        for n_head in get_non_integer(head, succ, parts[0]):
+            child = (*c_2, n_head)
+            graph = _partial_nauty_graph(n, (c_1, child))
+            if not _is_canonical_augmentation(n, graph, child):
+                continue
+            cert = pynauty.certificate(graph)
+            if cert in children:
+                continue
+            children.add(cert)
+            yield from _orderly_cycles(n, reminder, c_1, parts[1:], succ, child)
+
+
+def _minimal_translation(c_1, c_2):
+    """Second cover of the smallest coding isomorphic to (c_1, c_2) with c_1 as first cover: the one CANON accepts"""
+    coding = Coding((Cover(cycles=c_1), Cover(cycles=c_2)))
+    best = coding
+    for coding_reorder in ((coding,) if coding.covers[0].parts != coding.covers[1].parts else (coding, ~coding)):
+        for cover_reorder in coding_reorder.covers[0].cover_reordering():
+            for trans in Cover(cover_reorder).get_translations():
+                if coding_reorder.translation_lt(trans, best):
+                    best = coding_reorder.apply_translation(trans)
+    return best.covers[1].cycles
+
+
+def orderly_cycles(nodes, c_1, parts, succ):
+    n = len(nodes)
+    swap = tuple(len(c) for c in c_1) == parts
+    for c_2 in _orderly_cycles(n, nodes, c_1, parts, succ):
+        if swap and pynauty.certificate(_partial_nauty_graph(n, (c_1, c_2))) > pynauty.certificate(
+                _partial_nauty_graph(n, (c_2, c_1))):
+            continue
+        yield _minimal_translation(c_1, tuple(sorted(c_2, key=lambda x: (-len(x), x[0]))))
+
+
+def _first_cover(n, p_1):
+    nodes = tuple(range(n))
+    c_1 = tuple(nodes[sum(p_1[:i]):sum(p_1[:i + 1])] for i, p in enumerate(p_1))
+    succ = tuple(nodes[sum(p_1[:i]) + (j + 1) % p] for i, p in enumerate(p_1) for j in range(p))
+    return nodes, c_1, succ
+
+
+def codings_generator(n, parts, gen_type, k=2, start=0, stop=None):
     if not k == 2:
         raise NotImplemented
-    nodes = tuple(range(n))
     p_1, p_2 = parts
-    c_1 = tuple(nodes[sum(p_1[:i]):sum(p_1[:i + 1])] for i, p in enumerate(p_1))
+    nodes, c_1, succ = _first_cover(n, p_1)
     if gen_type == "full":
-        for c_2 in cycles(frozenset(nodes), p_2):
-            yield c_1, c_2
-        partition.cache_clear()
-        cycles.cache_clear()
+        c_2_gen = cycles(frozenset(nodes), p_2, skip=start)
     elif gen_type == "half":
-        succ = tuple(nodes[sum(p_1[:i]) + (j + 1) % p] for i, p in enumerate(p_1) for j in range(p))
-        for c_2 in cycles_no_integer(frozenset(nodes), p_2, succ=succ):
-            yield c_1, c_2
-        cycles_no_integer.cache_clear()
-        get_non_integer.cache_clear()
+        c_2_gen = cycles_no_integer(frozenset(nodes), p_2, succ=succ, skip=start)
+    elif gen_type == "orderly":
+        c_2_gen = islice(orderly_cycles(frozenset(nodes), c_1, p_2, succ=succ), start, None)
     else:
         raise NotImplemented
+    for c_2 in islice(c_2_gen, None if stop is None else stop - start):
+        yield c_1, c_2
+    if gen_type == "full":
+        partition.cache_clear()
+    _clear_caches()
+
+
+RANKABLE_GEN_TYPES = ("full", "half")
+
+
+def _rank_succ(n, p_1, gen_type):
+    if gen_type not in RANKABLE_GEN_TYPES:
+        raise NotImplemented
+    nodes, c_1, succ = _first_cover(n, p_1)
+    return nodes, c_1, succ if gen_type == "half" else None
+
+
+def _structure(nodes, succ):
+    """Sizes of the paths and cycles formed by the forbidden arcs (v, succ[v]) within nodes."""
+    nxt = dict((u, succ[u]) for u in nodes if succ[u] in nodes)
+    starts = set(nodes).difference(nxt.values())
+    sizes, seen = (list(), list()), set()
+    for closed, firsts in ((0, starts), (1, nodes)):
+        for u in firsts:
+            if u in seen:
+                continue
+            size, v = 0, u
+            while v not in seen:
+                seen.add(v)
+                size += 1
+                if v not in nxt:
+                    break
+                v = nxt[v]
+            sizes[closed].append(size)
+    return tuple(sorted(sizes[0])), tuple(sorted(sizes[1]))
+
+
+def _structure_instance(structure):
+    succ, start = list(), 0
+    for closed, sizes in enumerate(structure):
+        for size in sizes:
+            succ += list(range(start + 1, start + size)) + [start if closed else -1]
+            start += size
+    return frozenset(range(start)), tuple(succ)
+
+
+@cache
+def _ordered_cycles_count(structure, parts):
+    if len(parts) == 0:
+        return 1
+    nodes, succ = _structure_instance(structure)
+    total = 0
+    for head in combinations(sorted(nodes), parts[0]):
+        heads = _heads_count(head, succ)
+        if heads > 0:
+            total += heads * _ordered_cycles_count(_structure(nodes.difference(head), succ), parts[1:])
+    return total
+
+
+def count_codings(n, parts, gen_type, k=2):
+    if not k == 2:
+        raise NotImplemented
+    p_1, p_2 = parts
+    repeats = prod(factorial(p_2.count(p)) for p in set(p_2))
+    if gen_type == "full":
+        return factorial(n) // (prod(p_2) * repeats)
+    elif gen_type == "half":
+        nodes, c_1, succ = _first_cover(n, p_1)
+        return _ordered_cycles_count(_structure(frozenset(nodes), succ), p_2) // repeats
+    raise NotImplemented
+
+
+def unrank_coding(n, parts, gen_type, index, k=2):
+    if not k == 2:
+        raise NotImplemented
+    p_1, p_2 = parts
+    nodes, c_1, succ = _rank_succ(n, p_1, gen_type)
+    return c_1, _unrank_cycles(frozenset(nodes), p_2, succ, index)
+
+
+def rank_coding(n, parts, gen_type, coding, k=2):
+    if not k == 2:
+        raise NotImplemented
+    p_1, p_2 = parts
+    nodes, c_1, succ = _rank_succ(n, p_1, gen_type)
+    return _rank_cycles(frozenset(nodes), p_2, succ, coding[1])
+
+
+def codings_ranges(n, partition_func, gen_type, splits, k=2):
+    if gen_type not in RANKABLE_GEN_TYPES:
+        return None, tuple((parts, 0, None) for parts in partition_func(n, k))
+    counts = tuple((parts, count_codings(n, parts, gen_type, k)) for parts in partition_func(n, k))
+    total = sum(c for _, c in counts)
+    size = max(1, -(-total // splits))
+    return total, tuple((parts, start, min(start + size, count))
+                        for parts, count in counts for start in range(0, count, size))
 
 
 # def full_codings_generator_old(n, k=2):
@@ -180,6 +503,11 @@ CODINGS_GENERATORS = {
         # 'func': manual_codings_generator
         'func': (manual_partitions_generator, "half")
     },
+    'o': {
+        'name': "orderly",
+        'descr': "generates non-isomorphic graph codings with non-integer edges (canonical augmentation)",
+        'func': (partitions_generator, "orderly")
+    },
 }
 
 """
@@ -1,21 +1,28 @@
 from modules.models import get_models, GRAPH, TIMINGS, GAP_INFO
 from modules.calculations import Calculators, CANON, CERTIFICATE, SUBT_EXTR, GAP
-from modules.combinatorics import CODINGS_GENERATORS, codings_generator
-from modules.parallelization import parallel_run
+from modules.combinatorics import CODINGS_GENERATORS, RANKABLE_GEN_TYPES, codings_generator, codings_ranges, count_codings
+from modules.parallelization import parallel_run, propagate_results
 from modules import var
 from modules import utility as utl
 from modules.graph import Graph
 
 import os, logging
 import time
+import pickle
 
-from sqlalchemy import create_engine, select, update, bindparam, func
+from sqlalchemy import create_engine, select, update, bindparam, func, text, event
+from sqlalchemy.schema import CreateTable, CreateIndex
 from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.orm import Session
 import enlighten
+from enlighten._util import format_time
 import multiprocessing
 import queue
 
+# Columns copied from the class representative to the rest of the class after a grouped stage
+PROPAGATED_COLUMNS = {SUBT_EXTR: ('prop_subt', 'prop_extr'),
+                      GAP: ('gap',)}
+
 STRATEGIES = {
     "P": {
         'name': "properties",
@@ -116,6 +123,29 @@ STRATEGIES = {
                    'group_by': 'certificate'}),
         )
     },
+    "4": {  # CERT_Canon sets prop_canon along with the certificate
+        'name': "optimal_4",
+        'descr': "CERT+CANON > SUB_EXT > GAP",
+        'calculators': {CERTIFICATE: 1},
+        'sequence': (
+            (CERTIFICATE, {'where': {'certificate': None}}),
+            (SUBT_EXTR, {'where': {'prop_subt': None,
+                                   'prop_canon': True},
+                         'group_by': 'certificate'}),
+            (GAP, {'where': {'prop_canon': True,
+                             'prop_subt': True,
+                             'prop_extr': True,
+                             'gap': None},
+                   'group_by': 'certificate'}),
+        ),
+        'reduced_descr': "SUB_EXT > GAP",
+        'reduced_sequence': (
+            (SUBT_EXTR, {'where': {'prop_subt': None}}),
+            (GAP, {'where': {'prop_subt': True,
+                             'prop_extr': True,
+                             'gap': None}}),
+        )
+    },
     "-": {
         'name': "empty",
         'descr': "",
@@ -139,24 +169,24 @@ class GeneratorProcess(multiprocessing.Process):
         os.nice(var.PROCESSES_NICENESS)
         while True:
             try:
-                parts = self.input_queue.get(block=False)
+                parts, start, stop = self.input_queue.get(block=False)
             except queue.Empty:
                 break
             cache = list()
             if not self.reduced:
-                for i, c in enumerate(codings_generator(self.n, parts, self.gen_type, self.k)):
+                for i, c in enumerate(codings_generator(self.n, parts, self.gen_type, self.k, start=start, stop=stop)):
                     cache.append({"coding": c, "parts": parts})
-                    if i + 1 % self.chunksize == 0:
+                    if (i + 1) % self.chunksize == 0:
                         self.output_queue.put(cache)
                         cache = list()
                 self.output_queue.put(cache)
             else:
                 self.cert_calculator.initialize()
-                for i, c in enumerate(codings_generator(self.n, parts, self.gen_type, self.k)):
+                for i, c in enumerate(codings_generator(self.n, parts, self.gen_type, self.k, start=start, stop=stop)):
                     cert = self.cert_calculator.calc(Graph(n=self.n, k=self.k, weights=self.weights,
                                                            coding=c))[var.GRAPH_TABLE]['certificate']
                     cache.append({"coding": c, "parts": parts, "certificate": cert})
-                    if i + 1 % self.chunksize == 0:
+                    if (i + 1) % self.chunksize == 0:
                         self.output_queue.put(cache)
                         cache = list()
                 self.cert_calculator.close()
@@ -173,31 +203,37 @@ class Generator(object):
         self.chunksize, self.max_cache = chunksize, max_cache
         self.input_queue = multiprocessing.Queue()
 
-    def _update_database(self, session, models, cache):
-        session.execute(insert(models[GRAPH]), cache)
-        # session.execute(insert(models[TIMINGS]), tuple({"coding": entry["coding"]} for entry in cache))
-        session.commit()
+    def _update_database(self, conn, models, cache):
+        conn.execute(insert(models[GRAPH].__table__), cache)
+        conn.commit()
 
-    def _reduced_update_database(self, session, models, cache):
-        session.execute(insert(models[GRAPH]).on_conflict_do_nothing(index_elements=['certificate']), cache)
-        session.commit()
+    def _reduced_update_database(self, conn, models, cache):
+        conn.execute(insert(models[GRAPH].__table__).on_conflict_do_nothing(index_elements=['certificate']), cache)
+        conn.commit()
 
     UPDATE_FUNCTIONS = {False: _update_database,
                         True: _reduced_update_database}
 
+    def _flush(self, conn, models, cache, progbar):
+        cache.sort(key=lambda entry: entry["certificate" if self.reduced else "coding"])
+        Generator.UPDATE_FUNCTIONS[self.reduced](self, conn, models, cache)
+        progbar.update(incr=len(cache))
+
     def generate(self, engine, models):
         partition_func, gen_type = CODINGS_GENERATORS[self.generator]['func']
-        for p in partition_func(self.n, self.k):
-            self.input_queue.put(p)
+        total, ranges = codings_ranges(self.n, partition_func, gen_type,
+                                       splits=self.max_workers * var.GENERATOR_RANGES_PER_WORKER, k=self.k)
+        logging.trace(f"    Generating {total if total is not None else '?'} codings in {len(ranges)} ranges")
+        for r in ranges:
+            self.input_queue.put(r)
         processes = tuple(GeneratorProcess(i, gen_type, self.n, self.k, self.weights, self.reduced, self.input_queue,
                                            chunksize=self.chunksize, maxsize=10,
                                            cert_calculator=self.cert_calculator) for i in range(self.max_workers))
         for proc in processes:
             proc.start()
         manager = enlighten.get_manager()
-        progbar = manager.counter(total=None, desc='Generating', leave=False)
-        update_database_func = Generator.UPDATE_FUNCTIONS[self.reduced]
-        with Session(engine) as session:
+        progbar = manager.counter(total=total, desc='Generating', leave=False)
+        with engine.connect() as conn:
             cache = list()
             while True:
                 for proc in processes:
@@ -205,22 +241,94 @@ class Generator(object):
                         continue
                     cache += proc.output_queue.get(block=False)
                     if len(cache) >= self.max_cache:
-                        update_database_func(self, session, models, cache)
-                        progbar.update(incr=len(cache))
+                        self._flush(conn, models, cache, progbar)
                         cache = list()
                 if all(proc.output_queue.empty() and not proc.is_alive() for proc in processes):
                     if len(cache) > 0:
-                        update_database_func(self, session, models, cache)
-                        progbar.update(incr=len(cache))
+                        self._flush(conn, models, cache, progbar)
                     break
-            session.execute(insert(models[TIMINGS]).from_select(["coding", ], select(models[GRAPH].coding)))
-            session.commit()
-        logging.trace(
-            f"    Saved {session.query(models[GRAPH]).count()} entries out of {progbar.count} generated")
+            saved = conn.execute(select(func.count()).select_from(models[GRAPH].__table__)).scalar()
+        logging.trace(f"    Saved {saved} entries out of {progbar.count} generated")
         progbar.close()
         manager.stop()
 
 
+def _get_bulk_engine(path, sql_verbose=False):
+    engine = create_engine(f"sqlite:///{path}", echo=sql_verbose)
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma, value in var.BULK_LOAD_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+        cursor.close()
+
+    return engine
+
+
+def _create_tables(engine, metadata, indexed=()):
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            conn.execute(CreateTable(table, if_not_exists=True))
+            for index in table.indexes:
+                if any(c.name in indexed for c in index.columns):
+                    conn.execute(CreateIndex(index, if_not_exists=True))
+
+
+def _create_indexes(engine, metadata):
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+
+
+def _finalize_tables(engine, metadata, models):
+    _create_indexes(engine, metadata)
+    with engine.begin() as conn:
+        conn.execute(insert(models[TIMINGS].__table__).from_select(
+            ["id", ], select(models[GRAPH].id).where(models[GRAPH].id.not_in(select(models[TIMINGS].id)))))
+
+
+def _migrate_database(path, metadata, models, chunksize=var.MAX_COMMIT_CACHE):
+    old_engine = create_engine(f"sqlite:///{path}")
+    with old_engine.connect() as conn:
+        columns = tuple(row[1] for row in conn.execute(text(f"PRAGMA table_info({GRAPH})")))
+    if len(columns) == 0 or 'id' in columns:
+        with old_engine.begin() as conn:
+            for column in models[GRAPH].__table__.columns:
+                if len(columns) > 0 and column.name not in columns and column.nullable:
+                    logging.warning(f"    Adding column {column.name} to database {os.path.basename(path)}")
+                    conn.execute(text(f"ALTER TABLE {GRAPH} ADD COLUMN {column.name} "
+                                      f"{column.type.compile(dialect=conn.dialect)}"))
+        old_engine.dispose()
+        return
+    logging.warning(f"    Migrating database {os.path.basename(path)} to integer keys")
+    new_path = f"{path}.migrating"
+    if os.path.exists(new_path):
+        os.remove(new_path)
+    engine = create_engine(f"sqlite:///{new_path}")
+    metadata.create_all(engine)
+    with old_engine.connect() as old_conn, Session(engine) as session:
+        rows = old_conn.execute(text(f"SELECT rowid, coding, parts, certificate, gap, prop_subt, prop_extr, prop_canon "
+                                     f"FROM {GRAPH} ORDER BY rowid")).partitions(size=chunksize)
+        for chunk in rows:
+            session.execute(insert(models[GRAPH]), tuple(
+                {"id": row_id, "coding": pickle.loads(coding), "parts": pickle.loads(parts), "certificate": cert,
+                 "gap": gap, "prop_subt": subt, "prop_extr": extr, "prop_canon": canon}
+                for row_id, coding, parts, cert, gap, subt, extr, canon in chunk))
+        session.execute(text("ATTACH DATABASE :path AS old"), {"path": path})
+        for table in (TIMINGS, GAP_INFO):
+            table_columns = tuple(c.name for c in models[table].__table__.columns if c.name != 'id')
+            session.execute(text(f"INSERT INTO {table} (id, {', '.join(table_columns)}) "
+                                 f"SELECT g.rowid, {', '.join(f't.{c}' for c in table_columns)} "
+                                 f"FROM old.{table} t JOIN old.{GRAPH} g ON g.coding = t.coding"))
+        session.commit()
+        session.execute(text("DETACH DATABASE old"))
+    old_engine.dispose()
+    engine.dispose()
+    os.replace(new_path, path)
+
+
 def initialize_database(metadata, models, n, k, weights, strategy, generator, calculators,
                         delete=False, sql_verbose=False, reduced=False, force_generation=False, **options):
     path = var.DATABASE_FILEPATH.format(k=k, n=n, weights="-".join(str(i) for i in weights),
@@ -229,30 +337,84 @@ def initialize_database(metadata, models, n, k, weights, strategy, generator, ca
     if delete and os.path.exists(path):
         os.remove(path)
         logging.trace(f"    Deleted database {os.path.basename(path)}")
-    engine = create_engine(f"sqlite:///{path}", echo=sql_verbose)
+    if os.path.exists(path):
+        _migrate_database(path, metadata, models)
     if not os.path.exists(path) or force_generation:
         logging.trace(f"    Generating database {os.path.basename(path)}")
+        gen_path = path if os.path.exists(path) else f"{path}.generating"
         try:
-            if not os.path.exists(path):
-                metadata.create_all(engine)
+            if os.path.exists(gen_path) and gen_path != path:
+                os.remove(gen_path)
+            gen_engine = _get_bulk_engine(gen_path, sql_verbose=sql_verbose)
+            _create_tables(gen_engine, metadata, indexed=('certificate',) if reduced else ())
             calculator = calculators.get_calculation(CERTIFICATE, n=n, k=k, weights=weights,
                                                      **options) if reduced else None
             helper = Generator(generator, n, k, weights, max_workers=options["workers"],
                                reduced=reduced, calculator=calculator,
                                chunksize=options["max_chunksize"], max_cache=options["max_commit_cache"])
 
-            helper.generate(engine, models)
+            helper.generate(gen_engine, models)
+            logging.trace(f"    Building indexes")
+            _finalize_tables(gen_engine, metadata, models)
+            gen_engine.dispose()
+            os.replace(gen_path, path)
         except (Exception, KeyboardInterrupt) as e:
-            logging.warning(f"Interupted - Deleting database {os.path.basename(path)}")
-            os.remove(path)
+            logging.warning(f"Interupted - Deleting database {os.path.basename(gen_path)}")
+            os.remove(gen_path)
             raise
+    engine = create_engine(f"sqlite:///{path}", echo=sql_verbose)
+    _create_indexes(engine, metadata)
     logging.trace(f"    Loaded database {os.path.basename(path)}")
     return engine
 
 
+def _get_sequence(strategy, reduced):
+    sequence = STRATEGIES[strategy].get('sequence' if not reduced else 'reduced_sequence')
+    if sequence is None:
+        logging.warning("NO REDUCED SEQUENCE FOUND FOR STRATEGY - reverting to default sequence")
+        sequence = STRATEGIES[strategy]['sequence']
+    return sequence
+
+
+def plan(n, k, weights, strategy, generator, reduced, workers, **options):
+    partition_func, gen_type = CODINGS_GENERATORS[generator]['func']
+    exact = gen_type in RANKABLE_GEN_TYPES and not reduced
+    counts = tuple((parts, count_codings(n, parts, gen_type if gen_type in RANKABLE_GEN_TYPES else "half", k))
+                   for parts in partition_func(n, k))
+    total = sum(c for _, c in counts)
+    bound = '' if exact else '<='
+    rows_descr = '\n'.join(f"    {utl.seqence_to_str(parts):<32}{bound:>3}{count:>16}" for parts, count in counts)
+    stages = list()
+    for calc_type, statements in _get_sequence(strategy, reduced):
+        filtered = not exact or statements.get('group_by') is not None or any(statements['where'].values())
+        calc_time = utl.est_calc_time(n, calc_type)
+        stages.append(f"    {calc_type.upper():<10}{calc_time:>12.2E}s/graph    "
+                      f"{'<=' if filtered else '':>3}{format_time(calc_time * total / workers):>16}")
+    stages_descr = '\n'.join(stages)
+    logging.info(f"""
+
+{'-' * 128}
+PLAN           n={n}, k={k}, strategy={strategy}, generator={generator}{', REDUCED' if reduced else ''}, workers={workers}
+
+ROWS
+{rows_descr}
+
+    {'TOTAL':<32}{bound:>3}{total:>16}
+    {'DATABASE SIZE':<32}{bound:>3}{utl.format_size(utl.est_database_size(n, total)):>16}
+
+STAGES
+{stages_descr}
+{'-' * 128}
+
+""")
+    return total
+
+
 def run(n, k, weights, strategy, generator, calcs_indices, reduced, **options):
     weights = weights or (1,) * k
-    calculators = Calculators(calcs_indices)
+    calcs_indices = {**STRATEGIES[strategy].get('calculators', dict()),
+                     **dict(filter(lambda i: i[1] is not None, calcs_indices.items()))}
+    calculators = Calculators(calcs_indices, n=n)
     options.update({"est_calc_time_params": var.EST_CALC_TIME_PARAMS})
     infos = {"host": os.uname()[1],
              "n": n, "k": k, "weights": weights,
@@ -282,17 +444,14 @@ OPTIONS
 
 """)
     start_time = time.time()
-    metadata, models = get_models(n, k, weights, reduced=reduced)
+    metadata, models = get_models(n, k, weights, reduced=reduced, sequence=_get_sequence(strategy, reduced))
     logging.info("DATABASE")
     engine = initialize_database(metadata=metadata, models=models,
                                  n=n, k=k, weights=weights,
                                  strategy=strategy, generator=generator, calculators=calculators,
                                  reduced=reduced, **options)
     utl.save_run_info_file(infos, start_time=start_time, time_name="database", delete=options['delete'])
-    sequence = STRATEGIES[strategy].get('sequence' if not reduced else 'reduced_sequence')
-    if sequence is None:
-        logging.warning("NO REDUCED SEQUENCE FOUND FOR STRATEGY - reverting to default sequence")
-        sequence = STRATEGIES[strategy]['sequence']
+    sequence = _get_sequence(strategy, reduced)
     for calc_type, statements in sequence:
         logging.info(
             f"{calc_type.upper():<10} (where: {', '.join(f'{a}={v}' for a, v in statements['where'].items())} / group_by: {statements.get('group_by', '--- ')})")
@@ -301,6 +460,9 @@ OPTIONS
                               n=n, k=k, weights=weights,
                               calc_type=calc_type, calculators=calculators,
                               **statements, **options)
+        if statements.get('group_by') is not None and calc_type in PROPAGATED_COLUMNS:
+            propagate_results(engine=engine, models=models,
+                              columns=PROPAGATED_COLUMNS[calc_type], group_by=statements['group_by'])
         utl.save_run_info_file(infos, start_time=start_time, time_name=calc_type)
         if not result:
             break
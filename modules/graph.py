@@ -1,13 +1,51 @@
 from modules.coding import Coding, Cover
 from modules import graphics
 from modules import var
+from functools import cache
 import pynauty
 import numpy as np
 import networkx as nx
 
 
+@cache
+def _get_off_diagonal(n):
+    """Row and column indices of the n * (n - 1) arcs, in the same order as the edge vectors"""
+    rows, cols = np.nonzero(~np.identity(n, dtype=bool))
+    return rows, cols
+
+
+def _get_nauty_adjacency(n, successors):
+    """
+    Vertices, adjacency and colouring of the nauty graph of the covers, straight from their successors: arcs of
+    multiplicity c > 1 are subdivided by a vertex of colour c - 2.
+    """
+    adj, colors, size = dict(), list(set() for _ in range(len(successors) - 1)), n
+    for u, targets in enumerate(zip(*successors)):
+        adj[u] = list()
+        for v in sorted(set(targets)):
+            count = targets.count(v)
+            if count == 1:
+                adj[u].append(v)
+            else:
+                adj[u].append(size)
+                adj[size] = [v, ]
+                colors[count - 2].add(size)
+                size += 1
+    return size, adj, colors
+
+
+def set_nauty_graph(nauty_graph, n, successors):
+    """Makes an existing pynauty.Graph the nauty graph of the covers with the given successors (to reuse it)"""
+    size, adj, colors = _get_nauty_adjacency(n, successors)
+    nauty_graph.number_of_vertices = size
+    nauty_graph.set_adjacency_dict(adj)
+    nauty_graph.set_vertex_coloring(colors)
+    return nauty_graph
+
+
 class Graph(object):
-    LAZY_ATTRS = {'graph', 'vector', 'digraph', 'weighted_digraph', 'nauty_graph', 'adjacency_matrix', 'numpy_array'}
+    LAZY_ATTRS = {'successors', 'multiplicity', 'graph', 'vector', 'digraph', 'weighted_digraph', 'nauty_graph',
+                  'adjacency_matrix', 'numpy_array'}
 
     def __init__(self, n, k, weights, coding, **kwargs):
         self.n, self.k, self.weights = n, k, weights
@@ -16,7 +54,17 @@ class Graph(object):
 
     # PRIVATE UTILITIES
 
-    def _get_graph(self):
+    def _get_successors(self):
+        return np.array(tuple(cover.successors for cover in self.coding))
+
+    def _get_multiplicity(self):
+        mult = np.zeros((self.n, self.n), dtype=np.int8)
+        nodes = np.arange(self.n)
+        for succ in self.successors:
+            mult[nodes, succ] += 1
+        return mult
+
+    def _get_graph(self):  # networkx multigraph, only needed for drawing
         graph = nx.MultiDiGraph()
         for i, cover in enumerate(self.coding):
             for k, cycle in cover:
@@ -24,22 +72,21 @@ class Graph(object):
                 graph.add_edges_from((a, cycle[(b + 1) % k], i) for b, a in enumerate(cycle))
         return graph
 
-    def _edge_pairs_generator(self):
-        yield from ((u, v) for u in self.graph.nodes for v in self.graph.nodes if u != v)
-
     def edge_count_generator(self, weight=False):  # TODO: Implement weights
         if weight:
-            yield from ((u, v, self.graph.number_of_edges(u, v) / self.k) for u, v in self._edge_pairs_generator())
+            rows, cols = _get_off_diagonal(self.n)
+            yield from zip(rows.tolist(), cols.tolist(), (self.multiplicity[rows, cols] / self.k).tolist())
         else:
-            yield from ((u, v, len(edges)) for u, neigh in self.graph.adjacency() for v, edges in neigh.items())
+            rows, cols = np.nonzero(self.multiplicity)
+            yield from zip(rows.tolist(), cols.tolist(), self.multiplicity[rows, cols].tolist())
 
     def _get_vector(self):
-        return np.fromiter((self.graph.number_of_edges(u, v) for u, v in self._edge_pairs_generator()),
-                           dtype=np.float32) / self.k
+        return self.multiplicity[_get_off_diagonal(self.n)].astype(np.float32) / self.k
 
     def _get_digraph(self):
-        digraph = nx.DiGraph(self.graph)
+        digraph = nx.DiGraph()
         for u, v, c in self.edge_count_generator():
+            digraph.add_edge(u, v)
             for i in range(c - 1):
                 new = (u, v, i)
                 digraph.add_node(new)
@@ -52,27 +99,13 @@ class Graph(object):
         return digraph
 
     def _get_nauty_graph(self):
-        adj = dict((u, list()) for u in self.graph.nodes)
-        n = self.n
-        colors = list(set() for _ in range(self.k - 1))
-        for u, v, k in self.edge_count_generator():
-            if k == 1:
-                adj[u].append(v)
-            else:
-                adj[u].append(n)
-                adj[n] = [v, ]
-                colors[k - 2].add(n)
-                n += 1
-        return pynauty.Graph(n, directed=True, adjacency_dict=adj, vertex_coloring=colors)
+        return set_nauty_graph(pynauty.Graph(self.n, directed=True), self.n, self.successors.tolist())
 
     def _get_adjacency_matrix(self):
         return dict(((u, v), w) for u, v, w in self.edge_count_generator(weight=True))
 
     def _get_numpy_array(self):
-        arr = np.zeros((self.n, self.n))
-        for u, v, w in self.edge_count_generator(weight=True):
-            arr[u, v] = w
-        return arr
+        return self.multiplicity / self.k
 
     def __getattr__(self, item):
         assert item in Graph.LAZY_ATTRS
@@ -91,3 +124,62 @@ class Graph(object):
 
     def __repr__(self):
         return f"Graph {self.coding}"
+
+
+class GraphBatch(object):
+    LAZY_ATTRS = {'successors', 'multiplicity', 'vectors', 'graphs'}
+
+    def __init__(self, n, k, weights, items, **kwargs):
+        self.n, self.k, self.weights = n, k, weights
+        self.ids, self.codings = tuple(zip(*items)) if len(items) > 0 else (tuple(), tuple())
+
+    # PRIVATE UTILITIES
+
+    def _get_successors(self):
+        nodes, succ = list(), list()
+        for coding in self.codings:
+            for cover in coding:
+                for cycle in cover:
+                    nodes.extend(cycle)
+                    succ.extend(cycle[1:] + cycle[:1])
+        successors = np.empty(len(self) * self.k * self.n, dtype=int)
+        successors[np.repeat(np.arange(len(self) * self.k) * self.n, self.n) + nodes] = succ
+        return successors.reshape((len(self), self.k, self.n))
+
+    def _get_multiplicity(self):
+        mult = np.zeros((len(self), self.n, self.n), dtype=np.int8)
+        batch, nodes = np.arange(len(self))[:, np.newaxis], np.arange(self.n)[np.newaxis, :]
+        for i in range(self.k):
+            mult[batch, nodes, self.successors[:, i, :]] += 1
+        return mult
+
+    def _get_vectors(self):
+        rows, cols = _get_off_diagonal(self.n)
+        return self.multiplicity[:, rows, cols].astype(np.float32) / self.k
+
+    def __getattr__(self, item):
+        assert item in GraphBatch.LAZY_ATTRS
+        setattr(self, item, getattr(self, f"_get_{item}")())
+        return getattr(self, item)
+
+    def __len__(self):
+        return len(self.codings)
+
+    def _get_graphs(self):
+        graphs = list()
+        for i, coding in enumerate(self.codings):
+            graph = Graph(n=self.n, k=self.k, weights=self.weights, coding=coding)
+            if 'successors' in self.__dict__:
+                graph.successors = self.successors[i]
+            if 'multiplicity' in self.__dict__:
+                graph.multiplicity = self.multiplicity[i]
+            if 'vectors' in self.__dict__:
+                graph.vector = self.vectors[i]
+            graphs.append(graph)
+        return graphs
+
+    def __iter__(self):
+        return zip(self.ids, self.graphs)
+
+    def __repr__(self):
+        return f"GraphBatch ({len(self)} codings)"
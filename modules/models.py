@@ -4,7 +4,8 @@ from modules import var
 import modules.utility as utl
 
 from sqlalchemy.orm import DeclarativeBase, reconstructor
-from sqlalchemy import Integer, LargeBinary, Boolean, Float, String, PickleType, ForeignKey
+from sqlalchemy import Integer, LargeBinary, Boolean, Float, String, ForeignKey, Index, and_
+from sqlalchemy.types import TypeDecorator
 from sqlalchemy.orm import mapped_column, relationship
 
 GRAPH = var.GRAPH_TABLE
@@ -12,7 +13,73 @@ TIMINGS = var.TIMINGS_TABLE
 GAP_INFO = var.GAP_INFO_TABLE
 
 
-def get_models(N, K, W, reduced=False):
+class CodingType(TypeDecorator):
+    """
+    Stores a coding as k fixed-width blocks, one per cover, of (n + n // 2) bytes. Each cycle is written as its
+    nodes shifted by one and terminated by a zero byte, the block is zero-padded: blobs compare (memcmp) in the same
+    order as Coding.__lt__.
+    """
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, n, k, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.n, self.k = n, k
+        self.width = n + n // 2
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return b"".join(bytes(b for cycle in cover for b in (*(v + 1 for v in cycle), 0)).ljust(self.width, b"\0")
+                        for cover in value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return tuple(tuple(tuple(b - 1 for b in cycle)
+                           for cycle in value[i * self.width:(i + 1) * self.width].split(b"\0") if len(cycle) > 0)
+                     for i in range(self.k))
+
+
+class PartsType(TypeDecorator):
+    """Stores the parts of a coding as bytes, each cover terminated by a zero byte."""
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return bytes(b for cover in value for b in (*cover, 0))
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return tuple(tuple(cover) for cover in value.split(b"\0")[:-1])
+
+
+def _where_name(where):
+    return "_".join(f"{attr.removeprefix('prop_')}_{str(val).lower()}" for attr, val in where.items())
+
+
+def _add_stage_indexes(table_class, where, group_by=None):
+    """Adds the partial index scanned by a stage with the given where/group_by (see parallelization._get_statement)."""
+    indexes = table_class.__table__.indexes
+    names = set(index.name for index in indexes)
+    if group_by is not None:
+        where = {'representative': True, **where}
+    for stage_where in (where, dict(filter(lambda i: i[1] is not None, where.items()))):
+        if len(stage_where) == 0:
+            continue
+        name = f"ix_{var.GRAPH_TABLE}_id__{_where_name(stage_where)}"
+        if name not in names:
+            names.add(name)
+            Index(name, table_class.id,
+                  sqlite_where=and_(*(getattr(table_class, attr).is_(val) for attr, val in stage_where.items())))
+    if group_by is not None and f"ix_{var.GRAPH_TABLE}_{group_by}_coding" not in names:
+        Index(f"ix_{var.GRAPH_TABLE}_{group_by}_coding", getattr(table_class, group_by), table_class.coding)
+
+
+def get_models(N, K, W, reduced=False, sequence=None):
     class Base(DeclarativeBase):
         pass
 
@@ -22,13 +89,15 @@ def get_models(N, K, W, reduced=False):
         n = N
         k = K
         weights = W
-        coding = mapped_column(PickleType, nullable=False, primary_key=True)
-        parts = mapped_column(PickleType, nullable=False)
-        certificate = mapped_column(LargeBinary, nullable=True, unique=reduced)
+        id = mapped_column(Integer, primary_key=True)
+        coding = mapped_column(CodingType(N, K), nullable=False, unique=True, index=True)
+        parts = mapped_column(PartsType, nullable=False)
+        certificate = mapped_column(LargeBinary, nullable=True, unique=reduced, index=reduced)
         gap = mapped_column(Float, nullable=True)
         prop_subt = mapped_column(Boolean, nullable=True)
         prop_extr = mapped_column(Boolean, nullable=True)
         prop_canon = mapped_column(Boolean, nullable=True)
+        representative = mapped_column(Boolean, nullable=True)  # First coding of its certificate class
         gap_info = relationship("GAPInfo", back_populates="graph", lazy="immediate", uselist=False)
         timings = relationship("Timings", back_populates="graph", lazy="immediate", uselist=False)
 
@@ -36,7 +105,7 @@ def get_models(N, K, W, reduced=False):
             # self.n, self.k, self.weights = n, k, weights
             parts = tuple(tuple(len(c) for c in cover) for cover in coding)
             super().__init__(coding=coding, parts=parts, **kwargs)
-            Timings(coding=self.coding, graph=self)
+            Timings(graph=self)
             self._graph = None
             if not lazy:
                 self._init_on_load()
@@ -56,7 +125,7 @@ def get_models(N, K, W, reduced=False):
 
         def set_gap(self, gap, raw, session):
             self.gap = gap
-            session.add(GAPInfo(coding=self.coding, graph=self, raw=raw))
+            session.add(GAPInfo(graph=self, raw=raw))
 
         # GRAPHICS and FILES
 
@@ -77,7 +146,7 @@ def get_models(N, K, W, reduced=False):
 
     class Timings(Base):
         __tablename__ = var.TIMINGS_TABLE
-        coding = mapped_column(PickleType, ForeignKey(DatabaseGraph.coding), primary_key=True)
+        id = mapped_column(Integer, ForeignKey(DatabaseGraph.id), primary_key=True)
         graph = relationship("DatabaseGraph", back_populates="timings", lazy="immediate")
         subt_extr = mapped_column(Integer, nullable=True)
         canon = mapped_column(Integer, nullable=True)
@@ -86,7 +155,7 @@ def get_models(N, K, W, reduced=False):
 
     class GAPInfo(Base):
         __tablename__ = var.GAP_INFO_TABLE
-        coding = mapped_column(PickleType, ForeignKey(DatabaseGraph.coding), primary_key=True)
+        id = mapped_column(Integer, ForeignKey(DatabaseGraph.id), primary_key=True)
         graph = relationship("DatabaseGraph", back_populates="gap_info", lazy="immediate")
         sol_status = mapped_column(String)
         sol_term_cond = mapped_column(String)
@@ -96,6 +165,9 @@ def get_models(N, K, W, reduced=False):
         def __init__(self, raw, **kwargs):
             super().__init__(**utl.convert_raw_gurobi_info(raw), **kwargs)
 
+    for calc_type, statements in sequence or tuple():
+        _add_stage_indexes(DatabaseGraph, statements['where'], statements.get('group_by'))
+
     return Base.metadata, {GRAPH: DatabaseGraph,
                            TIMINGS: Timings,
                            GAP_INFO: GAPInfo}
@@ -1,4 +1,4 @@
-from sqlalchemy import select, insert, update, bindparam, and_
+from sqlalchemy import select, insert, update, bindparam, func
 from sqlalchemy.orm import Session, aliased
 
 from modules.models import GRAPH, TIMINGS, GAP_INFO
@@ -12,8 +12,8 @@ import signal
 import time
 import numpy as np
 
-COMMIT_UPDATE = lambda c: update(c).where(c.coding == bindparam("id"))
-COMMIT_INSERT = lambda c: insert(c).values(coding=bindparam("id"))
+COMMIT_UPDATE = lambda c: update(c).where(c.id == bindparam("row_id"))
+COMMIT_INSERT = lambda c: insert(c).values(id=bindparam("row_id"))
 
 COMMIT_TYPES = {GRAPH: COMMIT_UPDATE,
                 TIMINGS: COMMIT_UPDATE,
@@ -30,7 +30,7 @@ def _commit_cached(session, models, executor, manager):
                     value=f"Committing {committed} results ({manager.get_remaining() - committed} remaining)")
     for mod in cache[0][1].keys():
         session.execute(COMMIT_TYPES[mod](models[mod]),
-                        tuple(dict(id=coding, **result[mod]) for coding, result in cache))
+                        tuple(dict(row_id=row_id, **result[mod]) for row_id, result in cache))
     session.commit()
     del cache
     manager.update_committed(committed)
@@ -50,42 +50,51 @@ def _launch_batch(codings_gen, executor, manager, batch_n, batches):
     return batch_n + 1
 
 
+def _mark_representatives(session, models, group_by):
+    group_col = getattr(models[GRAPH], group_by)
+    unmarked = session.query(models[GRAPH].id).where(group_col.is_not(None),
+                                                     models[GRAPH].representative.is_(None)).limit(1).count()
+    if unmarked == 0:
+        return
+    logging.trace(f"    Marking class representatives by {group_by}")
+    graph_alias = aliased(models[GRAPH], name="graph_min")
+    group_where = getattr(graph_alias, group_by) == group_col
+    first_coding = func.coalesce(  # Canon codings first, as the stages may filter on prop_canon
+        select(func.min(graph_alias.coding)).where(group_where, graph_alias.prop_canon.is_not(False)).scalar_subquery(),
+        select(func.min(graph_alias.coding)).where(group_where).scalar_subquery())
+    session.execute(update(models[GRAPH]).where(group_col.is_not(None)).values(
+        representative=models[GRAPH].coding == first_coding))
+    session.commit()
+
+
+def propagate_results(engine, models, columns, group_by):
+    graph_alias = aliased(models[GRAPH], name="graph_repr")
+    repr_where = (getattr(graph_alias, group_by) == getattr(models[GRAPH], group_by),
+                  graph_alias.representative.is_(True))
+    with Session(engine) as session:
+        result = session.execute(update(models[GRAPH]).where(
+            models[GRAPH].representative.is_(False), getattr(models[GRAPH], columns[0]).is_(None)
+        ).values({col: select(getattr(graph_alias, col)).where(*repr_where).scalar_subquery() for col in columns}))
+        session.commit()
+    logging.trace(f"    Propagated {', '.join(columns)} to {result.rowcount} codings by {group_by}")
+
+
 def _get_statement(session, models, where, group_by):
+    if group_by is not None:
+        _mark_representatives(session, models, group_by)
+        where = {'representative': True, **where}
     where_smnt = tuple(getattr(models[GRAPH], attr).is_(val) for attr, val in where.items())
 
-    if group_by is None:
-        count_stmnt = session.query(models[GRAPH]).where(*where_smnt)
-    else:
-        graph_alias = aliased(models[GRAPH], name="graph_max")
-        count_stmnt = session.query(models[GRAPH]).join(
-            graph_alias,
-            and_(getattr(models[GRAPH], group_by) == getattr(graph_alias, group_by),
-                 models[GRAPH].coding > graph_alias.coding),
-            isouter=True
-        ).where(graph_alias.coding.is_(None), *where_smnt)
-
-    tot = count_stmnt.count()
+    tot = session.query(models[GRAPH]).where(*where_smnt).count()
     if tot == 0:
         return tot, None, None
 
-    if group_by is None:
-        statement = select(models[GRAPH].coding).where(
-            *where_smnt)  # .group_by(group_by_smnt)  # .order_by(None if group_by is None else models[GRAPH].coding)
-    else:
-        graph_alias = aliased(models[GRAPH], name="graph_max")
-        statement = select(models[GRAPH].coding).join(
-            graph_alias,
-            and_(getattr(models[GRAPH], group_by) == getattr(graph_alias, group_by),
-                 models[GRAPH].coding > graph_alias.coding),
-            isouter=True
-        ).where(graph_alias.coding.is_(None), *where_smnt)
+    statement = select(models[GRAPH].id, models[GRAPH].coding).where(*where_smnt)
 
     cmpl_stmnt = session.query(models[GRAPH])
     cmpl_where = dict(filter(lambda i: i[1] is not None, where.items()))
     if len(cmpl_where) > 0:
         cmpl_stmnt = cmpl_stmnt.where(*tuple(getattr(models[GRAPH], attr).is_(val) for attr, val in cmpl_where.items()))
-    if group_by is not None:
-        cmpl_stmnt = cmpl_stmnt.group_by(getattr(models[GRAPH], group_by))
     complete = cmpl_stmnt.count()
 
     return tot, complete, statement
@@ -112,7 +121,8 @@ def parallel_run(engine, models, n, k, weights, calc_type, calculators, workers,
         logging.trace(
             f"    To run {tot} out of {complete}    (chunksize {chunksize}, {batches} batches of {batch_size})")
 
-        codings_gen = session.scalars(statement).partitions(size=batch_size)
+        codings_gen = (tuple(tuple(row) for row in partition) for partition in
+                       session.execute(statement).partitions(size=batch_size))
         calculator = calculators.get_calculation(calc_type, n=n, k=k, weights=weights, **options)
 
         batch_n = 0
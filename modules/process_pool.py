@@ -7,7 +7,7 @@ from collections import deque
 
 from modules import var
 from modules import utility as utl
-from modules.graph import Graph
+from modules.graph import GraphBatch
 
 
 class CloseProcessPool(BaseException):
@@ -51,10 +51,7 @@ class WorkerProcess(multiprocessing.Process):
                 if codings is None:
                     break
                 self.set_current_item(codings)
-                results = list((
-                                   coding,
-                                   self.calculator.calc(Graph(**self.graph_kwargs, coding=coding))
-                               ) for coding in codings)
+                results = self.calculator.calc_batch(GraphBatch(**self.graph_kwargs, items=codings))
                 self.output_queue.put(results)
                 processed_items += len(codings)
                 del codings, results
@@ -138,7 +135,7 @@ class ProcessPool(object):
                 unfinished = process.get_current_item()
                 manager.add_log(type="PROCESS",
                                 value=f"{process.name} dead [pid: {process.pid}, exitcode: {process.exitcode}" + (
-                                    f", unfinished: {' - '.join(utl.seqence_to_str(c) for c in unfinished[0])}" if unfinished is not None else "") + "]")
+                                    f", unfinished: {' - '.join(utl.seqence_to_str(c) for c in unfinished[0][1])}" if unfinished is not None else "") + "]")
                 manager.deaths += 1
                 process.save_ram_history()
                 if unfinished is not None:
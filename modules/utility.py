@@ -131,9 +131,25 @@ def save_run_info_file(infos, start_time, time_name, delete=False):
         json.dump(infos, f, indent=var.RUN_INFO_INDENT)
 
 
-def calc_chunksize(n, calc_type, tot, workers, chunktime, max_chunksize, min_chunks, **kwargs):
+def est_calc_time(n, calc_type):
     params = var.EST_CALC_TIME_PARAMS[calc_type]
-    calc_time = params[0] * np.exp(params[1] * n)
+    return params[0] * np.exp(params[1] * n)
+
+
+def est_database_size(n, rows):
+    return rows * n * var.EST_DATABASE_NODE_BYTES
+
+
+def format_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}TB"
+
+
+def calc_chunksize(n, calc_type, tot, workers, chunktime, max_chunksize, min_chunks, **kwargs):
+    calc_time = est_calc_time(n, calc_type)
     est_chunksize = int(np.ceil(chunktime / calc_time))
     logging.trace(f"    [est. chunksize: {est_chunksize:<8} (est. calc_time {calc_time:.2E})")
     return min(est_chunksize, int(np.ceil(tot / (workers * min_chunks))), max_chunksize)
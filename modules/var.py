@@ -18,8 +18,10 @@ LATEX_GRAPH_DIR = os.path.join(LATEX_DIR, "graphs")
 LATEX_PLOTS_DIR = os.path.join(LATEX_DIR, "plots")
 DATABASE_DIR = os.path.join(DATA_DIR, "databases")
 STATS_DIR = os.path.join(DATA_DIR, "stats")
+TABLES_DIR = os.path.join(DATA_DIR, "tables")
 DATABASE_FILEPATH = os.path.join(DATABASE_DIR, "k{k}_n{n:02d}_w{weights}_{generator}{calculators}{strategy}{reduced}.cgdb")
 RUN_INFO_FILEPATH = os.path.join(DATABASE_DIR, "k{k}_n{n:02d}_w{weights}_{generator}{calculators}{strategy}{reduced}.json")
+TABLE_FILEPATH = os.path.join(TABLES_DIR, "{name}_n{n:02d}.npy")
 GENERATOR_SETTINGS_FILEPATH = os.path.join(GENERATOR_SETTINGS_DIR, "generator_settings_k{k}_n{n:02d}.json")
 BEST_GAPS_FILEPATH = os.path.join(DATA_DIR, "best_gaps.json")
 RUN_INFO_INDENT = 4
@@ -45,6 +47,22 @@ MIN_CHUNKS = 10
 BATCH_CHUNKS = 100
 GAP_WORKERS_FACTOR = 2
 
+CYCLES_CACHE_NODES = 6
+CYCLES_CACHE_SIZE = 4096
+GENERATOR_RANGES_PER_WORKER = 4
+SUBT_BATCH_MAX_ELEMENTS = 2 ** 24  # subsets x graphs entries per matrix product
+SUBT_REORDER_INTERVAL = 1000  # graphs between re-sorts of the SUBT_Direct subsets
+SUBT_MINCUT_MIN_N = 18  # Default SUBT_EXTR switches to the (polynomial) max-flow check from here on
+EXTR_RANK_PRIME = 2 ** 31 - 1  # int64 products stay exact
+CANON_FIRST_CHUNK = 16  # translations compared at once by CANON_Quick, doubling up to CANON_MAX_CHUNK
+CANON_MAX_CHUNK = 4096
+
+BULK_LOAD_PRAGMAS = {"journal_mode": "OFF",
+                     "synchronous": "OFF",
+                     "locking_mode": "EXCLUSIVE",
+                     "temp_store": "MEMORY",
+                     "cache_size": -1048576}  # KiB
+
 PRELOADED_BATCHES = 1
 PROCESSES_NICENESS = 1
 EST_CALC_TIME_PARAMS = {
@@ -53,6 +71,7 @@ EST_CALC_TIME_PARAMS = {
     "cert": (1.93e-04, -0.0884),
     "gap": (7e-9, 2.1)
 }
+EST_DATABASE_NODE_BYTES = 19  # per row, including certificate
 
 INITIAL_WAIT = 0
 RESTART_WAIT = 60
@@ -33,7 +33,7 @@ def update_database_old(n, k=2, weights=None, donor=None, recip=None):
                     progbar.update()
                     continue
                 to_update.append({
-                    "id": coding,
+                    "b_coding": coding,
                     "prop_subt": don_graph[0],
                     "prop_extr": don_graph[1],
                     "gap": don_graph[2]
@@ -42,14 +42,14 @@ def update_database_old(n, k=2, weights=None, donor=None, recip=None):
                 progbar.update()
                 if updated % STEP == 0:
                     print("\tCommitting...", end="")
-                    rec_sess.execute(update(g_mod).where(g_mod.coding == bindparam("id")),
+                    rec_sess.execute(update(g_mod).where(g_mod.coding == bindparam("b_coding")),
                                      to_update
                                  )
                     rec_sess.commit()
                     to_update = list()
                     print("Done")
             print("\tCommitting...", end="")
-            rec_sess.execute(update(g_mod).where(g_mod.coding == bindparam("id")),
+            rec_sess.execute(update(g_mod).where(g_mod.coding == bindparam("b_coding")),
                              to_update
                          )
             rec_sess.commit()